@@ -0,0 +1,77 @@
+import datetime
+from collections import Counter
+from db import read_db, transaction
+
+# Dimensions kept in commit_rollups; key is a student id, repo name or author login
+ROLLUP_KINDS = ("student", "repo", "author")
+
+
+def commit_day(timestamp: str | None) -> str:
+    # GitHub sends ISO 8601 with the committer's offset; days are counted in UTC
+    try:
+        moment = datetime.datetime.fromisoformat(timestamp)
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=datetime.timezone.utc)
+    except (TypeError, ValueError):
+        moment = datetime.datetime.now(datetime.timezone.utc)
+    return moment.astimezone(datetime.timezone.utc).date().isoformat()
+
+
+async def record_commits(
+    repo_full_name: str,
+    commits: list[dict],
+    guild_id: int,
+    student_id: int | None,
+) -> int:
+    counts: Counter[tuple[str, str, str]] = Counter()
+    async with transaction() as db:
+        for c in commits:
+            if not c.get("id"):
+                continue
+            author = (c.get("author") or {}).get("username") or (c.get("author") or {}).get("name")
+            day = commit_day(c.get("timestamp"))
+            # Redeliveries and the same commit pushed to another branch are ignored here
+            cur = await db.execute(
+                """
+                INSERT OR IGNORE INTO commit_events
+                    (repo_full_name, sha, guild_id, student_id, author, day, message)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (repo_full_name, c["id"], guild_id, student_id, author, day, c.get("message")),
+            )
+            if cur.rowcount == 0:
+                continue
+            counts[("repo", day, repo_full_name)] += 1
+            if student_id is not None:
+                counts[("student", day, str(student_id))] += 1
+            if author:
+                counts[("author", day, author)] += 1
+
+        # One upsert per (kind, day, key) for the whole delivery
+        await db.executemany(
+            """
+            INSERT INTO commit_rollups (guild_id, kind, day, key, commits) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(guild_id, kind, day, key) DO UPDATE SET commits = commits + excluded.commits
+            """,
+            [(guild_id, kind, day, key, n) for (kind, day, key), n in counts.items()],
+        )
+    return sum(n for (kind, _, _), n in counts.items() if kind == "repo")
+
+
+async def top_contributors(
+    guild_id: int, kind: str, days: int, limit: int = 10
+) -> list[tuple[str, int]]:
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+    since = today - datetime.timedelta(days=days - 1)
+    async with read_db() as db:
+        cur = await db.execute(
+            """
+            SELECT key, SUM(commits) AS total FROM commit_rollups
+            WHERE guild_id = ? AND kind = ? AND day >= ?
+            GROUP BY key
+            ORDER BY total DESC, key
+            LIMIT ?
+            """,
+            (guild_id, kind, since.isoformat(), limit),
+        )
+        return await cur.fetchall()
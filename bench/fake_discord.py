@@ -0,0 +1,305 @@
+import time
+import asyncio
+import logging
+import itertools
+from collections import defaultdict, deque
+import discord
+from discord.webhook.async_ import AsyncWebhookAdapter
+
+APPLICATION_ID = 900000000000000001
+BOT_USER_ID = 900000000000000002
+
+_log = logging.getLogger("discord.http")
+_ids = itertools.count(1)
+
+
+class FakeResponse:
+    # Just enough of aiohttp.ClientResponse for discord.HTTPException
+    def __init__(self, status: int, reason: str = "Not Found"):
+        self.status = status
+        self.reason = reason
+
+
+def snowflake() -> int:
+    # Real snowflakes, so Interaction.created_at and friends stay meaningful
+    return discord.utils.time_snowflake(discord.utils.utcnow()) + next(_ids) % 4096
+
+
+def user_payload(user_id: int, name: str, bot: bool = False) -> dict:
+    return {
+        "id": str(user_id),
+        "username": name,
+        "global_name": name,
+        "discriminator": "0",
+        "avatar": None,
+        "bot": bot,
+    }
+
+
+def member_payload(user_id: int, name: str, role_ids=()) -> dict:
+    return {
+        "user": user_payload(user_id, name),
+        "roles": [str(r) for r in role_ids],
+        "joined_at": discord.utils.utcnow().isoformat(),
+        "deaf": False,
+        "mute": False,
+        "flags": 0,
+    }
+
+
+def role_payload(role_id: int, name: str, position: int = 1) -> dict:
+    return {
+        "id": str(role_id),
+        "name": name,
+        "color": 0,
+        "hoist": False,
+        "position": position,
+        "permissions": "0",
+        "managed": False,
+        "mentionable": True,
+        "flags": 0,
+    }
+
+
+def channel_payload(
+    channel_id: int, name: str, guild_id: int, type: int = 0, parent_id: int | None = None
+) -> dict:
+    return {
+        "id": str(channel_id),
+        "type": type,
+        "guild_id": str(guild_id),
+        "name": name,
+        "position": 0,
+        "permission_overwrites": [],
+        "parent_id": str(parent_id) if parent_id else None,
+        "nsfw": False,
+        "topic": None,
+        "last_message_id": None,
+        "rate_limit_per_user": 0,
+    }
+
+
+def message_payload(
+    channel_id: int, author: dict, content: str = "", embeds=(), guild_id: int | None = None
+) -> dict:
+    data = {
+        "id": str(snowflake()),
+        "channel_id": str(channel_id),
+        "author": author,
+        "content": content,
+        "timestamp": discord.utils.utcnow().isoformat(),
+        "edited_timestamp": None,
+        "tts": False,
+        "mention_everyone": False,
+        "mentions": [],
+        "mention_roles": [],
+        "attachments": [],
+        "embeds": list(embeds),
+        "pinned": False,
+        "type": 0,
+        "flags": 0,
+    }
+    if guild_id:
+        data["guild_id"] = str(guild_id)
+    return data
+
+
+def guild_payload(guild_id: int, name: str, roles, channels, members) -> dict:
+    return {
+        "id": str(guild_id),
+        "name": name,
+        "owner_id": str(BOT_USER_ID),
+        "roles": [role_payload(guild_id, "@everyone", 0), *roles],
+        "channels": channels,
+        "members": members,
+        "member_count": len(members),
+        "large": False,
+        "features": [],
+        "emojis": [],
+        "stickers": [],
+        "threads": [],
+        "presences": [],
+        "voice_states": [],
+        "mfa_level": 0,
+        "verification_level": 0,
+        "explicit_content_filter": 0,
+        "default_message_notifications": 0,
+        "premium_tier": 0,
+        "system_channel_flags": 0,
+        "preferred_locale": "en-US",
+        "nsfw_level": 0,
+    }
+
+
+def interaction_payload(
+    guild_id: int, channel: dict, member: dict, command: str, options: list[dict] | None = None
+) -> dict:
+    return {
+        "id": str(snowflake()),
+        "application_id": str(APPLICATION_ID),
+        "type": 2,
+        "token": f"token-{next(_ids)}",
+        "version": 1,
+        "guild_id": str(guild_id),
+        "channel_id": channel["id"],
+        "channel": channel,
+        "member": member,
+        "locale": "en-US",
+        "guild_locale": "en-US",
+        "app_permissions": "0",
+        "entitlements": [],
+        "attachment_size_limit": 10 * 1024 * 1024,
+        "authorizing_integration_owners": {},
+        "data": {
+            "id": str(snowflake()),
+            "name": command,
+            "type": 1,
+            "guild_id": str(guild_id),
+            "options": options or [],
+        },
+    }
+
+
+class FakeDiscord:
+    """In-process stand-in for Discord's REST API and gateway.
+
+    REST calls made by discord.py (``bot.http.request`` and the interaction
+    webhook adapter) are answered locally after ``latency`` seconds. Each
+    route bucket allows ``rate_limit`` calls per ``rate_window`` seconds;
+    beyond that the call waits like discord.py does on a 429 and logs the
+    same warning, so the bot's own rate-limit metrics see it. Gateway
+    events are fed straight into the bot's connection state.
+    """
+
+    def __init__(self, bot, *, latency: float = 0.03, rate_limit: int = 5, rate_window: float = 5.0):
+        self.bot = bot
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.calls: dict[str, int] = defaultdict(int)
+        self.rate_limited = 0
+        self._buckets: dict[tuple, deque] = defaultdict(deque)
+        # guild id -> member payloads, served to fetch_member(s) since the bot caches none
+        self.members: dict[int, dict[int, dict]] = defaultdict(dict)
+        self._original_webhook_request = None
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def reset_counters(self):
+        self.calls.clear()
+        self.rate_limited = 0
+
+    def install(self):
+        state = self.bot._connection
+        state.application_id = APPLICATION_ID
+        state.user = discord.ClientUser(
+            state=state, data=user_payload(BOT_USER_ID, "devforge-bot", bot=True)
+        )
+        self.bot.http.request = self.request
+
+        fake = self
+
+        async def webhook_request(adapter, route, session, **kwargs):
+            return await fake.webhook_request(route, **kwargs)
+
+        self._original_webhook_request = AsyncWebhookAdapter.request
+        AsyncWebhookAdapter.request = webhook_request
+
+    def uninstall(self):
+        if self._original_webhook_request is not None:
+            AsyncWebhookAdapter.request = self._original_webhook_request
+
+    async def _throttle(self, route):
+        key = (route.method, route.path, route.major_parameters)
+        window = self._buckets[key]
+        while True:
+            now = time.monotonic()
+            while window and now - window[0] >= self.rate_window:
+                window.popleft()
+            if len(window) < self.rate_limit:
+                window.append(now)
+                break
+            retry_after = self.rate_window - (now - window[0])
+            self.rate_limited += 1
+            _log.warning(
+                "We are being rate limited. %s %s responded with 429. Retrying in %.2f seconds.",
+                route.method,
+                route.url,
+                retry_after,
+            )
+            await asyncio.sleep(retry_after)
+        await asyncio.sleep(self.latency)
+
+    async def request(self, route, **kwargs):
+        self.calls[f"{route.method} {route.path}"] += 1
+        await self._throttle(route)
+        return self.respond(route, kwargs.get("json"), kwargs.get("params"))
+
+    async def webhook_request(self, route, payload=None, **kwargs):
+        self.calls[f"{route.method} {route.path}"] += 1
+        await asyncio.sleep(self.latency)
+        if route.path.endswith("/callback"):
+            interaction_id = route.url.split("/interactions/")[1].split("/")[0]
+            return {"interaction": {"id": interaction_id, "type": 2}}
+        if route.method in ("POST", "PATCH") and "/webhooks/" in route.path:
+            payload = payload or {}
+            return message_payload(
+                0, user_payload(BOT_USER_ID, "devforge-bot", bot=True),
+                payload.get("content") or "", payload.get("embeds") or (),
+            )
+        return None
+
+    def respond(self, route, body: dict | None, query: dict | None = None):
+        body = body or {}
+        query = query or {}
+        params = route.__dict__
+        path = route.path
+        state = self.bot._connection
+        bot_author = user_payload(BOT_USER_ID, "devforge-bot", bot=True)
+
+        if route.method == "POST" and path == "/channels/{channel_id}/messages":
+            return message_payload(
+                params["channel_id"], bot_author, body.get("content") or "", body.get("embeds") or ()
+            )
+        if route.method == "PATCH" and path == "/channels/{channel_id}/messages/{message_id}":
+            data = message_payload(
+                params["channel_id"], bot_author, body.get("content") or "", body.get("embeds") or ()
+            )
+            data["id"] = route.url.rsplit("/", 1)[1]
+            return data
+        if route.method == "POST" and path == "/guilds/{guild_id}/roles":
+            data = role_payload(snowflake(), body.get("name", "role"))
+            state.parse_guild_role_create({"guild_id": str(params["guild_id"]), "role": data})
+            return data
+        if route.method == "POST" and path == "/guilds/{guild_id}/channels":
+            data = channel_payload(
+                snowflake(), body["name"], params["guild_id"], body.get("type", 0), body.get("parent_id")
+            )
+            state.parse_channel_create(data)
+            return data
+        if route.method == "PATCH" and path == "/channels/{channel_id}":
+            channel = self.bot.get_channel(params["channel_id"])
+            return channel_payload(
+                params["channel_id"], getattr(channel, "name", "channel"), channel.guild.id,
+                channel.type.value, getattr(channel, "category_id", None),
+            )
+        if route.method == "POST" and path == "/users/@me/channels":
+            return {"id": str(snowflake()), "type": 1, "recipients": [user_payload(int(body["recipient_id"]), "user")]}
+        if route.method == "GET" and path == "/guilds/{guild_id}/members/{member_id}":
+            member = self.members[int(params["guild_id"])].get(int(route.url.rsplit("/", 1)[1]))
+            if member is None:
+                raise discord.NotFound(FakeResponse(404), {"code": 10007, "message": "Unknown Member"})
+            return member
+        if route.method == "GET" and path == "/guilds/{guild_id}/members":
+            after = int(query.get("after", 0))
+            members = sorted(self.members[int(params["guild_id"])].items())
+            return [m for member_id, m in members if member_id > after][: query.get("limit", 1000)]
+        if route.method == "PUT" and path.startswith("/applications/"):
+            return []
+        return None
+
+    def guild_create(self, payload: dict):
+        self.members[int(payload["id"])] = {int(m["user"]["id"]): m for m in payload["members"]}
+        self.bot._connection.parse_guild_create(payload)
@@ -0,0 +1,399 @@
+import os
+import sys
+import hmac
+import json
+import time
+import uuid
+import socket
+import random
+import asyncio
+import hashlib
+import argparse
+import tempfile
+
+# Cogs read their configuration at import time, so pin it before importing them
+BENCH_GUILD_ID = 100000000000000001
+os.environ["GUILD_IDS"] = str(BENCH_GUILD_ID)
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(prefix="devforge-bench-"), "bench.db"))
+os.environ.setdefault("METRICS_ENABLED", "1")
+os.environ.setdefault("GITHUB_WEBHOOK_SECRET", "bench-secret")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+os.environ["GITHUB_WEBHOOK_PORT"] = str(free_port())
+
+import aiohttp
+import discord
+from db import DB_QUERY_SECONDS, read_db, transaction, close_db
+from roles import CORE_ROLES, save_role_ids
+from bot import DevForgeBot
+from github_events import EVENT_HANDLERS
+from bench.fake_discord import (
+    FakeDiscord,
+    snowflake,
+    user_payload,
+    member_payload,
+    role_payload,
+    channel_payload,
+    message_payload,
+    guild_payload,
+    interaction_payload,
+)
+
+WORKLOADS = ("push", "checks", "messages", "projects")
+
+
+class World:
+    """Snowflakes for the synthetic guild the workloads run against."""
+
+    def __init__(self, students: int):
+        self.roles = {key: snowflake() for key in CORE_ROLES}
+        self.admin_id = snowflake()
+        self.help_channel_id = snowflake()
+        self.board_channel_id = snowflake()
+        self.students: list[dict] = []
+        for i in range(students):
+            self.students.append(
+                {
+                    "user_id": snowflake(),
+                    "name": f"student{i}",
+                    "category_id": snowflake(),
+                    "channel_id": snowflake(),
+                    "repo": f"devforge-bench/project-{i}",
+                }
+            )
+
+    def guild(self) -> dict:
+        guild_id = BENCH_GUILD_ID
+        roles = [
+            role_payload(role_id, CORE_ROLES[key]["name"], position=i + 1)
+            for i, (key, role_id) in enumerate(self.roles.items())
+        ]
+        channels = [
+            channel_payload(self.help_channel_id, "help", guild_id),
+            channel_payload(self.board_channel_id, "mentors", guild_id),
+        ]
+        members = [member_payload(self.admin_id, "mentor", [self.roles["admin"]])]
+        for s in self.students:
+            channels.append(channel_payload(s["category_id"], f"student-{s['name']}", guild_id, type=4))
+            channels.append(
+                channel_payload(s["channel_id"], f"proj-{s['name']}", guild_id, parent_id=s["category_id"])
+            )
+            members.append(member_payload(s["user_id"], s["name"], [self.roles["student"]]))
+        return guild_payload(guild_id, "DevForge bench", roles, channels, members)
+
+    async def seed(self):
+        await save_role_ids(BENCH_GUILD_ID, self.roles)
+        async with transaction() as db:
+            await db.executemany(
+                "INSERT OR IGNORE INTO users (id, is_student, category_id) VALUES (?, 1, ?)",
+                [(s["user_id"], s["category_id"]) for s in self.students],
+            )
+            await db.executemany(
+                """
+                INSERT INTO projects (student_id, channel_id, title, repo_url, status)
+                VALUES (?, ?, ?, ?, 'in_progress')
+                """,
+                [
+                    (s["user_id"], s["channel_id"], f"Project {s['name']}", f"https://github.com/{s['repo']}")
+                    for s in self.students
+                ],
+            )
+            await db.executemany(
+                "INSERT OR IGNORE INTO repos (repo_full_name, channel_id, events) VALUES (?, ?, ?)",
+                [(s["repo"], s["channel_id"], ",".join(EVENT_HANDLERS)) for s in self.students],
+            )
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def db_seconds() -> float:
+    return sum(series[1] for series in DB_QUERY_SECONDS.series.values())
+
+
+class Measurement:
+    def __init__(self, name: str, fake: FakeDiscord):
+        self.name = name
+        self.fake = fake
+        self.latencies: list[float] = []
+        self.events = 0
+
+    def __enter__(self):
+        self.fake.reset_counters()
+        self.db_start = db_seconds()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        self.db = db_seconds() - self.db_start
+
+    def report(self) -> dict:
+        return {
+            "workload": self.name,
+            "events": self.events,
+            "seconds": round(self.elapsed, 3),
+            "events_per_second": round(self.events / self.elapsed, 1) if self.elapsed else 0.0,
+            "p50_ms": round(percentile(self.latencies, 0.50) * 1000, 2),
+            "p99_ms": round(percentile(self.latencies, 0.99) * 1000, 2),
+            "db_ms": round(self.db * 1000, 2),
+            "rest_calls": self.fake.total_calls,
+            "rate_limited": self.fake.rate_limited,
+        }
+
+
+def push_payload(repo: str, commits: int) -> dict:
+    return {
+        "ref": "refs/heads/main",
+        "repository": {"full_name": repo},
+        "commits": [
+            {
+                "id": uuid.uuid4().hex,
+                "message": f"Bench commit {i}: tighten error handling in the parser",
+                "url": f"https://github.com/{repo}/commit/{i}",
+                "author": {"name": "Bench Author", "username": "bench"},
+            }
+            for i in range(commits)
+        ],
+    }
+
+
+def check_run_payload(repo: str, sha: str, name: str, status: str, conclusion: str | None) -> dict:
+    return {
+        "action": "completed" if status == "completed" else "created",
+        "repository": {"full_name": repo},
+        "check_run": {
+            "head_sha": sha,
+            "name": name,
+            "status": status,
+            "conclusion": conclusion,
+            "html_url": f"https://github.com/{repo}/runs/{uuid.uuid4().int % 10**9}",
+        },
+    }
+
+
+async def deliver_all(m: "Measurement", event: str, payloads: list[dict]):
+    url = f"http://127.0.0.1:{os.environ['GITHUB_WEBHOOK_PORT']}/github"
+    secret = os.environ["GITHUB_WEBHOOK_SECRET"].encode()
+    bodies = [json.dumps(p) for p in payloads]
+
+    async with aiohttp.ClientSession() as session:
+
+        async def deliver(body: str):
+            digest = hmac.new(secret, body.encode(), hashlib.sha256).hexdigest()
+            headers = {
+                "X-GitHub-Event": event,
+                "X-Hub-Signature-256": f"sha256={digest}",
+                "X-GitHub-Delivery": str(uuid.uuid4()),
+                "Content-Type": "application/json",
+            }
+            start = time.perf_counter()
+            async with session.post(url, data=body, headers=headers) as resp:
+                await resp.read()
+            m.latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(deliver(body) for body in bodies))
+
+    # Throughput counts until the worker pool has handled every delivery
+    while True:
+        async with read_db() as db:
+            cur = await db.execute(
+                "SELECT COUNT(*) FROM webhook_deliveries WHERE status IN ('pending', 'processing')"
+            )
+            (remaining,) = await cur.fetchone()
+        if not remaining:
+            break
+        await asyncio.sleep(0.02)
+    m.events = len(payloads)
+
+
+async def bench_push(bot: DevForgeBot, fake: FakeDiscord, world: World, args) -> dict:
+    payloads = [
+        push_payload(world.students[i % len(world.students)]["repo"], args.commits)
+        for i in range(args.deliveries)
+    ]
+    with Measurement("push", fake) as m:
+        await deliver_all(m, "push", payloads)
+    return m.report()
+
+
+async def bench_checks(bot: DevForgeBot, fake: FakeDiscord, world: World, args) -> dict:
+    # Every check of every head commit goes queued -> in_progress -> completed
+    payloads = []
+    for s in world.students:
+        sha = uuid.uuid4().hex
+        for step in (("queued", None), ("in_progress", None), ("completed", "success")):
+            for check in range(args.checks):
+                payloads.append(check_run_payload(s["repo"], sha, f"ci/job-{check}", *step))
+
+    with Measurement("checks", fake) as m:
+        await deliver_all(m, "check_run", payloads)
+        live = bot.get_cog("GitHubIntegration").live
+        while live.flushes:
+            await asyncio.gather(*list(live.flushes.values()))
+    return m.report()
+
+
+async def bench_messages(bot: DevForgeBot, fake: FakeDiscord, world: World, args) -> dict:
+    state = bot._connection
+    guild = bot.get_guild(BENCH_GUILD_ID)
+    moderation = bot.get_cog("Moderation")
+    channels = [guild.get_channel(world.help_channel_id)]
+    channels += [guild.get_channel(s["channel_id"]) for s in world.students[:4]]
+
+    rng = random.Random(args.seed)
+    messages = []
+    for i in range(args.messages):
+        author_id = rng.randrange(1, 1 + args.messages // 4 + 1)
+        if rng.random() < args.greeting_ratio:
+            content = rng.choice(("hi", "hello", "zdr", "може ли въпрос?"))
+        else:
+            content = "Как да оправя KeyError при достъп до dict в цикъл? Ето кода: ..."
+        channel = rng.choice(channels)
+        data = message_payload(channel.id, user_payload(author_id, f"user{author_id}"), content, guild_id=guild.id)
+        messages.append(discord.Message(state=state, channel=channel, data=data))
+
+    with Measurement("messages", fake) as m:
+        for message in messages:
+            start = time.perf_counter()
+            await moderation.on_message(message)
+            m.latencies.append(time.perf_counter() - start)
+        # Includes the coalescing window, so this is end-to-end moderation throughput
+        await asyncio.gather(*list(moderation.flush_tasks))
+        m.events = len(messages)
+    return m.report()
+
+
+async def bench_projects(bot: DevForgeBot, fake: FakeDiscord, world: World, args) -> dict:
+    state = bot._connection
+    guild = bot.get_guild(BENCH_GUILD_ID)
+    admin = member_payload(world.admin_id, "mentor", [world.roles["admin"]])
+    students = world.students[: args.projects]
+
+    def interaction(student: dict, member: dict, command: str, options=None) -> discord.Interaction:
+        channel = guild.get_channel(student["channel_id"])
+        channel_data = channel_payload(channel.id, channel.name, guild.id, parent_id=channel.category_id)
+        data = interaction_payload(guild.id, channel_data, member, command, options)
+        return discord.Interaction(data=data, state=state)
+
+    async def cycle(student: dict, m: Measurement):
+        member = member_payload(student["user_id"], student["name"], [world.roles["student"]])
+        steps = (
+            (member, "project_mark_done", None),
+            (admin, "project_feedback", [{"name": "issues", "type": 3, "value": "Добави тестове."}]),
+            (admin, "project_approve", None),
+        )
+        for who, command, options in steps:
+            start = time.perf_counter()
+            it = interaction(student, who, command, options)
+            # Same order as the gateway's INTERACTION_CREATE handler
+            bot.dispatch("interaction", it)
+            await bot.tree._call(it)
+            m.latencies.append(time.perf_counter() - start)
+
+    await bot.project_board.attach(guild.get_channel(world.board_channel_id))
+
+    with Measurement("projects", fake) as m:
+        await asyncio.gather(*(cycle(s, m) for s in students))
+        await bot.command_runner.drain()
+        # Includes the dashboard's debounced edits
+        while bot.project_board.flush_task:
+            await bot.project_board.flush_task
+        m.events = len(students) * 3
+    return m.report()
+
+
+async def start(args) -> tuple[DevForgeBot, FakeDiscord, World]:
+    bot = DevForgeBot()
+    fake = FakeDiscord(
+        bot, latency=args.latency_ms / 1000, rate_limit=args.rate_limit[0], rate_window=args.rate_limit[1]
+    )
+    await bot._async_setup_hook()
+    fake.install()
+
+    world = World(max(args.projects, 8))
+    fake.guild_create(world.guild())
+    await world.seed()
+    await bot.setup_hook()
+    # What the gateway's READY does; tasks waiting on wait_until_ready start here
+    bot._ready.set()
+    bot.dispatch("ready")
+
+    github = bot.get_cog("GitHubIntegration")
+    while not github.runner.addresses or not github.workers:
+        await asyncio.sleep(0.01)
+    return bot, fake, world
+
+
+async def stop(bot: DevForgeBot, fake: FakeDiscord):
+    await bot.command_runner.drain()
+    await bot.outbound.close()
+    for name in list(bot.extensions):
+        await bot.unload_extension(name)
+    await bot.project_board.close()
+    await close_db()
+    fake.uninstall()
+
+
+async def run(args) -> list[dict]:
+    bot, fake, world = await start(args)
+    results = []
+    try:
+        for workload in args.workload:
+            results.append(await globals()[f"bench_{workload}"](bot, fake, world, args))
+    finally:
+        await stop(bot, fake)
+    return results
+
+
+def parse_rate_limit(value: str) -> tuple[int, float]:
+    calls, _, window = value.partition("/")
+    return int(calls), float(window or 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the bot's cogs against an in-process fake Discord and GitHub."
+    )
+    parser.add_argument("--workload", action="append", choices=WORKLOADS, help="repeatable; default: all")
+    parser.add_argument("--latency-ms", type=float, default=30.0, help="simulated Discord REST latency")
+    parser.add_argument(
+        "--rate-limit", type=parse_rate_limit, default=(5, 5.0), help="calls/seconds per route bucket"
+    )
+    parser.add_argument("--deliveries", type=int, default=200)
+    parser.add_argument("--commits", type=int, default=5, help="commits per push delivery")
+    parser.add_argument("--checks", type=int, default=4, help="check runs per head commit")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--greeting-ratio", type=float, default=0.1)
+    parser.add_argument("--projects", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print results as JSON lines")
+    args = parser.parse_args()
+    args.workload = args.workload or list(WORKLOADS)
+
+    results = asyncio.run(run(args))
+    if args.json:
+        for result in results:
+            print(json.dumps(result))
+        return
+
+    columns = list(results[0]) if results else []
+    print()
+    print("  ".join(f"{c:>17}" for c in columns))
+    for result in results:
+        print("  ".join(f"{result[c]!s:>17}" for c in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,199 @@
 import os
+import time
+import json
 import asyncio
+import hashlib
+from contextlib import contextmanager
 from dotenv import load_dotenv
+
+# Local modules read their settings at import time, so .env has to be loaded first
+load_dotenv()
+
 import discord
 from discord.ext import commands
-from db import get_db, close_db
-from roles import ensure_role
+from db import get_db, close_db, get_state, set_state
+from roles import CORE_ROLES, reconcile_roles, save_role_ids
+from guild_config import GuildConfig, GuildConfigs, env_guild_ids
+from routing import RepoRoutes
+from project_index import ProjectIndex
+from project_board import ProjectBoard
+from members import MemberResolver, member_cache_flags
+from outbound import Outbound
+from topology import GuildTopology
+from execution import CommandRunner
+from metrics import METRICS_ENABLED, Gauge, instrument_http, watch_loop_lag
 
-load_dotenv()
 INTENTS = discord.Intents.default()
 INTENTS.members = True
 INTENTS.message_content = True
-GUILD_ID = int(os.getenv("GUILD_ID", "0"))
+EXTENSIONS = (
+    "cogs.onboarding",
+    "cogs.students",
+    "cogs.projects",
+    "cogs.github_integration",
+    "cogs.moderation",
+    "cogs.inactivity",
+    "cogs.search",
+)
+
+
+@contextmanager
+def timed(phase: str):
+    start = time.perf_counter()
+    yield
+    print(f"[INFO] startup: {phase} took {(time.perf_counter() - start) * 1000:.0f} ms")
+
 
 class DevForgeBot(commands.Bot):
     def __init__(self):
-        super().__init__(command_prefix="!", intents=INTENTS)
-        self.core_roles = {}
+        # Members are fetched on demand, so startup doesn't wait on chunking the whole guild
+        super().__init__(
+            command_prefix="!",
+            intents=INTENTS,
+            member_cache_flags=member_cache_flags(),
+            chunk_guilds_at_startup=False,
+        )
+        self.guild_configs = GuildConfigs()
+        self.member_resolver = MemberResolver(self.guild_configs)
+        self.repo_routes = RepoRoutes()
+        self.project_index = ProjectIndex()
+        self.project_board = ProjectBoard(self, self.project_index)
+        self.topology = GuildTopology()
+        # Every non-response Discord call goes through here, by priority class
+        self.outbound = Outbound()
+        self.command_runner = CommandRunner(self.outbound)
 
     async def setup_hook(self):
-        await get_db()
-        guild = self.get_guild(GUILD_ID) or await self.fetch_guild(GUILD_ID)
-        await self._ensure_core_roles(guild)
+        if METRICS_ENABLED:
+            instrument_http(self.http)
+            Gauge(
+                "devforge_gateway_latency_seconds",
+                "Discord gateway heartbeat latency.",
+                read=lambda: self.latency,
+            )
+            Gauge(
+                "devforge_member_cache_size",
+                "Members held by the LRU member resolver.",
+                read=lambda: len(self.member_resolver),
+            )
+            Gauge(
+                "devforge_outbound_queued",
+                "Discord calls waiting in the outbound queue.",
+                read=lambda: self.outbound.queued,
+            )
+            self.loop.create_task(watch_loop_lag())
+        self.outbound.start()
+
+        with timed("database and caches"):
+            await get_db()
+            # Loaded first: it assigns pre-multi-guild projects to a guild
+            await self.guild_configs.load(env_guild_ids())
+            await self.repo_routes.load()
+            await self.project_index.load()
+            await self.project_board.load()
+            await self.topology.load()
+
+        with timed("extensions"):
+            await asyncio.gather(*(self.load_extension(name) for name in EXTENSIONS))
+
+        configs = self.guild_configs.all()
+        with timed(f"guild setup ({len(configs)} guild(s))"):
+            # Guilds are independent, so one slow or broken community doesn't hold up the rest
+            results = await asyncio.gather(
+                *(self._setup_guild(config) for config in configs), return_exceptions=True
+            )
+            for config, result in zip(configs, results):
+                if isinstance(result, Exception):
+                    print(f"[ERROR] setup of guild {config.guild_id} failed: {result!r}")
 
-        await self.load_extension("cogs.onboarding")
-        await self.load_extension("cogs.students")
-        await self.load_extension("cogs.projects")
-        await self.load_extension("cogs.github_integration")
-        await self.load_extension("cogs.moderation")
+    async def _setup_guild(self, config: GuildConfig):
+        # Warm restarts trust the persisted role IDs; on_ready re-checks them
+        if config.roles.keys() != CORE_ROLES.keys():
+            guild = self.get_guild(config.guild_id) or await self.fetch_guild(config.guild_id)
+            await self._ensure_core_roles(guild)
 
-        await self.tree.sync(guild=discord.Object(id=GUILD_ID))
+        # Commands are defined once and registered per configured guild, never globally
+        guild = discord.Object(id=config.guild_id)
+        self.tree.copy_global_to(guild=guild)
+        await self._sync_tree(guild)
+
+    async def _sync_tree(self, guild: discord.abc.Snowflake):
+        # tree.sync is rate limited, so only call it when the command surface changed
+        commands_json = json.dumps(
+            [cmd.to_dict(self.tree) for cmd in self.tree.get_commands(guild=guild)],
+            sort_keys=True,
+        )
+        digest = hashlib.sha256(commands_json.encode()).hexdigest()
+        key = f"tree_hash:{guild.id}"
+        if await get_state(key) == digest:
+            print(f"[INFO] Command tree for guild {guild.id} unchanged, skipping sync")
+            return
+        await self.tree.sync(guild=guild)
+        await set_state(key, digest)
 
     async def _ensure_core_roles(self, guild: discord.Guild):
-        admin = await ensure_role(guild, "👑 Admin", permissions=discord.Permissions(administrator=True))
-        student = await ensure_role(guild, "🎓 Student", color=discord.Color.blue())
-        pending = await ensure_role(guild, "⏳ Pending", color=discord.Color.light_grey())
-        inactive = await ensure_role(guild, "🚫 Inactive", color=discord.Color.dark_grey())
-        mentor = await ensure_role(guild, "👨‍🏫 Mentor", color=discord.Color.gold())
-        web = await ensure_role(guild, "🌐 Web")
-        backend = await ensure_role(guild, "⚙️ Backend")
-        systems = await ensure_role(guild, "🧠 Systems / Low-level")
-        mobile = await ensure_role(guild, "📱 Mobile")
-        desktop = await ensure_role(guild, "🖥️ Desktop")
-        self.core_roles = {
-            "admin": admin.id, "student": student.id, "pending": pending.id,
-            "inactive": inactive.id, "mentor": mentor.id, "web": web.id,
-            "backend": backend.id, "systems": systems.id,
-            "mobile": mobile.id, "desktop": desktop.id
-        }
+        roles = await reconcile_roles(guild)
+        await save_role_ids(guild.id, roles)
+        self.guild_configs.set_roles(guild.id, roles)
+
+    async def on_ready(self):
+        stale = []
+        for config in self.guild_configs.all():
+            guild = self.get_guild(config.guild_id)
+            if guild is None:
+                continue
+            self.topology.rebuild(guild)
+            if any(guild.get_role(i) is None for i in config.roles.values()):
+                stale.append(self._ensure_core_roles(guild))
+        await asyncio.gather(*stale)
+
+    async def on_guild_join(self, guild: discord.Guild):
+        # A configured community that only now invited the bot
+        config = self.guild_configs.get(guild.id)
+        if config:
+            self.topology.rebuild(guild)
+            await self._setup_guild(config)
+
+    async def on_guild_role_delete(self, role: discord.Role):
+        if role.id in self.guild_configs.roles(role.guild.id).values():
+            await self._ensure_core_roles(role.guild)
+
+    async def on_interaction(self, interaction: discord.Interaction):
+        # Interactions carry a fresh member payload, so the LRU is warmed for free
+        if isinstance(interaction.user, discord.Member):
+            self.member_resolver.remember(interaction.user)
+
+    async def on_raw_member_remove(self, payload: discord.RawMemberRemoveEvent):
+        self.member_resolver.forget(payload.guild_id, payload.user.id)
+
+    async def on_guild_channel_create(self, channel: discord.abc.GuildChannel):
+        self.topology.add(channel)
+
+    async def on_guild_channel_update(
+        self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel
+    ):
+        self.topology.remove(before)
+        self.topology.add(after)
+
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        self.topology.remove(channel)
+        if channel.id in self.project_board.boards:
+            await self.project_board.detach(channel.id)
+
+    async def on_app_command_completion(
+        self, interaction: discord.Interaction, command: discord.app_commands.Command
+    ):
+        self.command_runner.observe_response(interaction)
+        if not interaction.extras.get("background"):
+            self.command_runner.observe_total(interaction)
 
     async def close(self):
+        await self.command_runner.drain()
+        # Cogs flush to the database on unload, so they go before the pool is closed
+        for name in list(self.extensions):
+            await self.unload_extension(name)
+        await self.project_board.close()
+        await self.outbound.close()
         await close_db()
         await super().close()
 
@@ -1,10 +1,76 @@
+import os
+import hmac
+import time
+import asyncio
+import hashlib
 import json
 from aiohttp import web
 import discord
+from discord import app_commands
 from discord.ext import commands
-from db import get_db
+from db import transaction
+from metrics import METRICS_ENABLED, Counter, Histogram, render
+from github_events import EVENT_HANDLERS, LiveMessages
+from routing import DEFAULT_REPO_EVENTS, parse_events
+from activity import record_commits
+from outbound import Priority, SendFailed
 
-GITHUB_WEBHOOK_PORT = 8000  # adjust if needed
+GITHUB_WEBHOOK_PORT = int(os.getenv("GITHUB_WEBHOOK_PORT", "8000"))
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "4"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "6"))
+WEBHOOK_POLL_SECONDS = 5.0
+WEBHOOK_BACKOFF_SECONDS = 2.0
+WEBHOOK_BACKOFF_MAX_SECONDS = 600.0
+WEBHOOK_RETENTION_DAYS = 7
+# Shared secret configured on the GitHub webhook; empty disables signature checks
+GITHUB_WEBHOOK_SECRET = os.getenv("GITHUB_WEBHOOK_SECRET", "").encode()
+WEBHOOK_MAX_BODY_BYTES = int(os.getenv("WEBHOOK_MAX_BODY_BYTES", str(5 * 1024 * 1024)))
+WEBHOOK_READ_CHUNK = 64 * 1024
+
+WEBHOOK_SECONDS = Histogram(
+    "devforge_webhook_seconds",
+    "GitHub webhook handling time, by stage.",
+    label="stage",
+)
+WEBHOOK_DELIVERIES = Counter(
+    "devforge_webhook_deliveries_total",
+    "GitHub webhook deliveries, by outcome.",
+    label="outcome",
+)
+
+
+def is_admin(member: discord.Member, bot: commands.Bot) -> bool:
+    admin_id = bot.guild_configs.roles(member.guild.id).get("admin")
+    return bool(admin_id and any(r.id == admin_id for r in member.roles))
+
+
+class PayloadTooLarge(Exception):
+    pass
+
+
+async def read_signed_body(request: web.Request, signature: str) -> bytes | None:
+    # Hashes chunks as they arrive so forged or oversized bodies are dropped before parsing
+    mac = hmac.new(GITHUB_WEBHOOK_SECRET, digestmod=hashlib.sha256)
+    chunks: list[bytes] = []
+    size = 0
+    async for chunk in request.content.iter_chunked(WEBHOOK_READ_CHUNK):
+        size += len(chunk)
+        if size > WEBHOOK_MAX_BODY_BYTES:
+            raise PayloadTooLarge()
+        mac.update(chunk)
+        chunks.append(chunk)
+    # Compared as bytes: compare_digest rejects str with non-ASCII characters
+    if GITHUB_WEBHOOK_SECRET and not hmac.compare_digest(
+        f"sha256={mac.hexdigest()}".encode(), signature.encode("utf-8", "surrogateescape")
+    ):
+        return None
+    return b"".join(chunks)
+
+
+class DeliveryError(Exception):
+    def __init__(self, message: str, progress: int = 0):
+        super().__init__(message)
+        self.progress = progress
 
 
 class GitHubIntegration(commands.Cog):
@@ -12,52 +78,345 @@ class GitHubIntegration(commands.Cog):
         self.bot = bot
         self.app = web.Application()
         self.app.router.add_post("/github", self.handle_github)
+        if METRICS_ENABLED:
+            self.app.router.add_get("/metrics", self.handle_metrics)
         self.runner = web.AppRunner(self.app)
+        self.wakeup = asyncio.Event()
+        self.channel_locks: dict[int, asyncio.Lock] = {}
+        self.live = LiveMessages(bot.outbound)
+        self.workers: list[asyncio.Task] = []
         self.bot.loop.create_task(self.start_server())
+        self.bot.loop.create_task(self.start_workers())
 
     async def start_server(self):
         await self.runner.setup()
         site = web.TCPSite(self.runner, "0.0.0.0", GITHUB_WEBHOOK_PORT)
         await site.start()
         print(f"[INFO] GitHub webhook server listening on :{GITHUB_WEBHOOK_PORT}/github")
+        if not GITHUB_WEBHOOK_SECRET:
+            print("[WARN] GITHUB_WEBHOOK_SECRET is not set; webhook signatures are not checked")
+
+    async def start_workers(self):
+        # Deliveries resolve their channel from the cache, which the gateway fills on ready
+        await self.bot.wait_until_ready()
+        async with transaction() as db:
+            # Anything left in 'processing' was interrupted by a crash or restart
+            await db.execute(
+                "UPDATE webhook_deliveries SET status = 'pending' WHERE status = 'processing'"
+            )
+            await db.execute(
+                """
+                DELETE FROM webhook_deliveries
+                WHERE status = 'done' AND received_at < datetime('now', ?)
+                """,
+                (f"-{WEBHOOK_RETENTION_DAYS} days",),
+            )
+        self.workers = [
+            asyncio.create_task(self.run_worker(i)) for i in range(WEBHOOK_WORKERS)
+        ]
+        print(f"[INFO] GitHub ingest started with {WEBHOOK_WORKERS} worker(s)")
 
     async def cog_unload(self):
+        for task in self.workers:
+            task.cancel()
+        self.live.cancel()
         await self.runner.cleanup()
 
+    async def handle_metrics(self, request: web.Request):
+        return web.Response(text=render(), content_type="text/plain", charset="utf-8")
+
     async def handle_github(self, request: web.Request):
+        start = time.perf_counter()
+        try:
+            response = await self.ingest(request)
+        finally:
+            WEBHOOK_SECONDS.observe("ingest", time.perf_counter() - start)
+        WEBHOOK_DELIVERIES.inc(response.text)
+        return response
+
+    async def ingest(self, request: web.Request):
         event = request.headers.get("X-GitHub-Event", "")
-        if event != "push":
+        handler = EVENT_HANDLERS.get(event)
+        if handler is None:
             return web.Response(text="ignored")
 
-        body = await request.text()
-        data = json.loads(body)
+        delivery_id = request.headers.get("X-GitHub-Delivery")
+        if not delivery_id:
+            return web.Response(status=400, text="missing delivery id")
+
+        if (request.content_length or 0) > WEBHOOK_MAX_BODY_BYTES:
+            return web.Response(status=413, text="payload too large")
+
+        signature = request.headers.get("X-Hub-Signature-256", "")
+        if GITHUB_WEBHOOK_SECRET and not signature:
+            return web.Response(status=401, text="missing signature")
+
+        try:
+            raw = await read_signed_body(request, signature)
+        except PayloadTooLarge:
+            return web.Response(status=413, text="payload too large")
+        if raw is None:
+            return web.Response(status=401, text="bad signature")
 
+        try:
+            # json.loads takes bytes, so the body is never held as a decoded str too
+            data = handler.extract(json.loads(raw))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return web.Response(status=400, text="bad payload")
+        del raw
+        if data is None:
+            return web.Response(text="ignored")
+
+        # Unmapped or filtered repos are answered from the routing cache without touching SQLite
         repo_full_name = data["repository"]["full_name"]
-        commits = data.get("commits", [])
+        if await self.bot.repo_routes.lookup(repo_full_name) is None:
+            return web.Response(text="no mapping")
+        if not self.bot.repo_routes.accepts(repo_full_name, event):
+            return web.Response(text="filtered")
+
+        body = json.dumps(data, separators=(",", ":"))
+
+        async with transaction() as db:
+            cur = await db.execute(
+                """
+                INSERT OR IGNORE INTO webhook_deliveries (delivery_id, event, payload)
+                VALUES (?, ?, ?)
+                """,
+                (delivery_id, event, body),
+            )
+        if cur.rowcount == 0:
+            return web.Response(status=202, text="duplicate")
+
+        self.wakeup.set()
+        return web.Response(status=202, text="accepted")
+
+    async def claim_delivery(self):
+        async with transaction() as db:
+            cur = await db.execute(
+                """
+                UPDATE webhook_deliveries
+                SET status = 'processing', attempts = attempts + 1
+                WHERE delivery_id = (
+                    SELECT delivery_id FROM webhook_deliveries
+                    WHERE status = 'pending' AND next_attempt_at <= ?
+                    ORDER BY next_attempt_at LIMIT 1
+                )
+                RETURNING delivery_id, event, payload, attempts, progress
+                """,
+                (time.time(),),
+            )
+            return await cur.fetchone()
 
-        db = await get_db()
-        cur = await db.execute(
-            "SELECT channel_id FROM repos WHERE repo_full_name = ?",
-            (repo_full_name,),
+    async def run_worker(self, worker_id: int):
+        while True:
+            try:
+                row = await self.claim_delivery()
+            except Exception as e:
+                print(f"[ERROR] webhook worker {worker_id}: {e!r}")
+                row = None
+
+            if row is None:
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), WEBHOOK_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self.handle_delivery(*row)
+            except Exception as e:
+                print(f"[ERROR] webhook worker {worker_id}: {e!r}")
+
+    async def handle_delivery(
+        self, delivery_id: str, event: str, payload: str, attempts: int, progress: int
+    ):
+        start = time.perf_counter()
+        try:
+            await self.process_delivery(event, json.loads(payload), progress)
+        except Exception as e:
+            WEBHOOK_DELIVERIES.inc("retry")
+            await self.fail_delivery(delivery_id, attempts, e)
+        else:
+            async with transaction() as db:
+                await db.execute(
+                    """
+                    UPDATE webhook_deliveries SET status = 'done', last_error = NULL
+                    WHERE delivery_id = ?
+                    """,
+                    (delivery_id,),
+                )
+            WEBHOOK_DELIVERIES.inc("processed")
+        finally:
+            WEBHOOK_SECONDS.observe("process", time.perf_counter() - start)
+
+    async def fail_delivery(self, delivery_id: str, attempts: int, error: Exception):
+        if attempts >= WEBHOOK_MAX_ATTEMPTS:
+            status, delay = "failed", 0.0
+            print(
+                f"[ERROR] webhook delivery {delivery_id} failed after {attempts} attempt(s): {error!r}"
+            )
+        else:
+            status = "pending"
+            delay = min(
+                WEBHOOK_BACKOFF_SECONDS * 2 ** (attempts - 1), WEBHOOK_BACKOFF_MAX_SECONDS
+            )
+
+        async with transaction() as db:
+            await db.execute(
+                """
+                UPDATE webhook_deliveries
+                SET status = ?, next_attempt_at = ?, last_error = ?,
+                    progress = COALESCE(?, progress)
+                WHERE delivery_id = ?
+                """,
+                (
+                    status,
+                    time.time() + delay,
+                    repr(error),
+                    getattr(error, "progress", None),
+                    delivery_id,
+                ),
+            )
+
+    async def process_delivery(self, event: str, data: dict, progress: int):
+        handler = EVENT_HANDLERS.get(event)
+        if handler is None:
+            return
+
+        repo_full_name = data["repository"]["full_name"]
+        channel_id = await self.bot.repo_routes.lookup(repo_full_name)
+        if channel_id is None:
+            return
+
+        # A mapped channel that can't be fetched fails the delivery, so it's retried
+        channel = self.bot.get_channel(channel_id) or await self.bot.fetch_channel(channel_id)
+
+        if event == "push":
+            # Idempotent per commit, so a retried delivery does not double count
+            project = self.bot.project_index.get(channel_id)
+            await record_commits(
+                repo_full_name,
+                data.get("commits", []),
+                channel.guild.id,
+                project.student_id if project else None,
+            )
+            inactivity = self.bot.get_cog("Inactivity")
+            if project and inactivity:
+                inactivity.touch(channel.guild.id, project.student_id)
+
+        if handler.key:
+            # Serialises a key's first send with its later edits
+            lock = self.channel_locks.setdefault(channel_id, asyncio.Lock())
+            self.live.update(channel, handler, data, lock)
+            return
+
+        # Queued as one unit, so another delivery's messages can't land between this
+        # one's; feed messages that queue up behind a busy channel are merged
+        messages = handler.render(data)
+        try:
+            await self.bot.outbound.send_all(
+                channel,
+                Priority.FEED,
+                [{"embeds": embeds} for embeds in messages[progress:]],
+                coalesce=True,
+            )
+        except SendFailed as e:
+            raise DeliveryError(str(e), progress=progress + e.sent) from e.error
+
+    @app_commands.command(
+        name="webhook_replay",
+        description="Пусни отново неуспешни GitHub доставки (Admin only).",
+    )
+    @app_commands.describe(delivery_id="X-GitHub-Delivery; празно = всички неуспешни.")
+    async def webhook_replay(
+        self, interaction: discord.Interaction, delivery_id: str | None = None
+    ):
+        if not is_admin(interaction.user, self.bot):
+            await interaction.response.send_message("Нямаш права.", ephemeral=True)
+            return
+
+        async with transaction() as db:
+            if delivery_id:
+                cur = await db.execute(
+                    """
+                    UPDATE webhook_deliveries
+                    SET status = 'pending', attempts = 0, next_attempt_at = 0,
+                        progress = CASE WHEN status = 'done' THEN 0 ELSE progress END
+                    WHERE delivery_id = ?
+                    """,
+                    (delivery_id,),
+                )
+            else:
+                cur = await db.execute(
+                    """
+                    UPDATE webhook_deliveries
+                    SET status = 'pending', attempts = 0, next_attempt_at = 0
+                    WHERE status = 'failed'
+                    """
+                )
+        self.wakeup.set()
+
+        await interaction.response.send_message(
+            f"Пуснати отново: {cur.rowcount} доставки.", ephemeral=True
         )
-        row = await cur.fetchone()
-        if not row:
-            return web.Response(text="no mapping")
 
-        channel_id = row[0]
-        channel = self.bot.get_channel(channel_id)
-        if channel is None:
-            return web.Response(text="no channel")
+    @app_commands.command(
+        name="routes_reload",
+        description="Презареди кеша repo → канал от базата (Admin only).",
+    )
+    async def routes_reload(self, interaction: discord.Interaction):
+        if not is_admin(interaction.user, self.bot):
+            await interaction.response.send_message("Нямаш права.", ephemeral=True)
+            return
+
+        self.bot.repo_routes.invalidate()
+        await self.bot.repo_routes.load()
+        await interaction.response.send_message("Кешът е презареден.", ephemeral=True)
 
-        for c in commits:
-            msg = c.get("message", "").strip()
-            url = c.get("url")
-            author = c.get("author", {}).get("username") or c.get("author", {}).get(
-                "name"
+    @app_commands.command(
+        name="repo_events",
+        description="Избери кои GitHub събития се пускат за repo (Admin only).",
+    )
+    @app_commands.describe(
+        repo="owner/name",
+        events="Със запетаи, напр. push,pull_request,check_run; празно = по подразбиране.",
+    )
+    async def repo_events(
+        self, interaction: discord.Interaction, repo: str, events: str | None = None
+    ):
+        if not is_admin(interaction.user, self.bot):
+            await interaction.response.send_message("Нямаш права.", ephemeral=True)
+            return
+
+        value = None
+        if events is not None:
+            names = parse_events(events)
+            unknown = names - EVENT_HANDLERS.keys()
+            if unknown or not names:
+                await interaction.response.send_message(
+                    f"Непознати събития: {', '.join(sorted(unknown)) or '-'}. "
+                    f"Поддържани: {', '.join(sorted(EVENT_HANDLERS))}.",
+                    ephemeral=True,
+                )
+                return
+            value = ",".join(sorted(names))
+
+        async with transaction() as db:
+            cur = await db.execute(
+                "UPDATE repos SET events = ? WHERE repo_full_name = ? RETURNING channel_id",
+                (value, repo),
             )
-            await channel.send(f"`{author}` → `{msg}`\n<{url}>")
+            row = await cur.fetchone()
+        if row is None:
+            await interaction.response.send_message("Няма такова repo.", ephemeral=True)
+            return
 
-        return web.Response(text="ok")
+        self.bot.repo_routes.set(repo, row[0], value)
+        shown = value or ",".join(sorted(DEFAULT_REPO_EVENTS))
+        await interaction.response.send_message(
+            f"Събития за `{repo}`: {shown}.", ephemeral=True
+        )
 
 
 async def setup(bot: commands.Bot):
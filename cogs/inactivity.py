@@ -0,0 +1,202 @@
+import os
+import time
+import asyncio
+from functools import partial
+import discord
+from discord.ext import commands, tasks
+from db import read_db, transaction, get_state, set_state
+from guild_config import GuildConfig
+from project_index import Project
+from outbound import Priority
+
+INACTIVE_AFTER_DAYS = float(os.getenv("INACTIVE_AFTER_DAYS", "14"))
+INACTIVITY_CHECK_MINUTES = 15
+# Role edits per guild per tick, paced so a big backlog drains over several ticks
+ROLE_EDITS_PER_TICK = 50
+ROLE_EDIT_INTERVAL_SECONDS = 1.0
+
+
+class Inactivity(commands.Cog):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        # (guild_id, student_id) -> last activity; written out once per tick
+        self.pending: dict[tuple[int, int], float] = {}
+
+    async def cog_load(self):
+        self.bot.project_index.listeners.append(self.project_changed)
+        self.check.start()
+
+    async def cog_unload(self):
+        self.check.cancel()
+        if self.project_changed in self.bot.project_index.listeners:
+            self.bot.project_index.listeners.remove(self.project_changed)
+        await self.flush()
+
+    def touch(self, guild_id: int, student_id: int, when: float | None = None):
+        key = (guild_id, student_id)
+        when = when or time.time()
+        if when > self.pending.get(key, 0.0):
+            self.pending[key] = when
+
+    def project_changed(self, project: Project, old_status: str | None):
+        self.touch(project.guild_id, project.student_id)
+
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message):
+        if message.guild is None or message.author.bot:
+            return
+        if message.guild.id not in self.bot.guild_configs:
+            return
+        category_id = getattr(message.channel, "category_id", None)
+        if not category_id:
+            return
+        category = self.bot.topology.student_category(message.guild, message.author)
+        if category is not None and category.id == category_id:
+            self.touch(message.guild.id, message.author.id)
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # Students from before tracking existed get a row, without resetting anyone's clock.
+        # Members aren't cached, so each guild is paged over REST once, noted in bot_state.
+        for config in self.bot.guild_configs.all():
+            guild = self.bot.get_guild(config.guild_id)
+            key = f"activity_seeded:{config.guild_id}"
+            if guild is None or not config.roles.get("student") or await get_state(key):
+                continue
+            try:
+                seeded = await self.seed(guild, config.roles["student"])
+            except discord.HTTPException as e:
+                print(f"[WARN] seeding student activity for guild {guild.id} failed: {e}")
+                continue
+            await set_state(key, "1")
+            print(f"[INFO] seeded activity for {seeded} student(s) in guild {guild.id}")
+
+    async def seed(self, guild: discord.Guild, student_role_id: int) -> int:
+        now = time.time()
+        rows = [
+            (guild.id, member.id, now)
+            async for member in guild.fetch_members(limit=None)
+            if member.get_role(student_role_id)
+        ]
+        if rows:
+            async with transaction() as db:
+                await db.executemany(
+                    """
+                    INSERT OR IGNORE INTO student_activity (guild_id, student_id, last_seen)
+                    VALUES (?, ?, ?)
+                    """,
+                    rows,
+                )
+        return len(rows)
+
+    async def flush(self):
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, {}
+        try:
+            async with transaction() as db:
+                await db.executemany(
+                    """
+                    INSERT INTO student_activity (guild_id, student_id, last_seen)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT(guild_id, student_id)
+                    DO UPDATE SET last_seen = MAX(last_seen, excluded.last_seen)
+                    """,
+                    [(guild_id, student_id, when) for (guild_id, student_id), when in pending.items()],
+                )
+        except Exception:
+            # Keep the touches for the next tick
+            for key, when in pending.items():
+                if when > self.pending.get(key, 0.0):
+                    self.pending[key] = when
+            raise
+
+    @tasks.loop(minutes=INACTIVITY_CHECK_MINUTES)
+    async def check(self):
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"[ERROR] inactivity flush: {e!r}")
+            return
+        for config in self.bot.guild_configs.all():
+            try:
+                await self.update_guild(config)
+            except Exception as e:
+                print(f"[ERROR] inactivity check for guild {config.guild_id}: {e!r}")
+
+    @check.before_loop
+    async def before_check(self):
+        await self.bot.wait_until_ready()
+
+    async def update_guild(self, config: GuildConfig):
+        guild = self.bot.get_guild(config.guild_id)
+        inactive_role = guild.get_role(config.roles.get("inactive", 0)) if guild else None
+        student_role_id = config.roles.get("student")
+        if inactive_role is None:
+            return
+
+        cutoff = time.time() - INACTIVE_AFTER_DAYS * 86400
+        # Only rows whose state has to flip are read: both are index range scans
+        async with read_db() as db:
+            cur = await db.execute(
+                """
+                SELECT student_id FROM student_activity
+                WHERE guild_id = ? AND inactive = 0 AND last_seen < ?
+                LIMIT ?
+                """,
+                (guild.id, cutoff, ROLE_EDITS_PER_TICK),
+            )
+            went_quiet = [row[0] for row in await cur.fetchall()]
+            cur = await db.execute(
+                """
+                SELECT student_id FROM student_activity
+                WHERE guild_id = ? AND inactive = 1 AND last_seen >= ?
+                LIMIT ?
+                """,
+                (guild.id, cutoff, ROLE_EDITS_PER_TICK),
+            )
+            came_back = [row[0] for row in await cur.fetchall()]
+
+        updates = []
+        for student_id, inactive in [(s, 1) for s in went_quiet] + [(s, 0) for s in came_back]:
+            try:
+                member = await self.bot.member_resolver.resolve(guild, student_id)
+            except discord.HTTPException as e:
+                # Left unmarked, so the next tick retries this student
+                print(f"[WARN] fetch of member {student_id} failed: {e}")
+                continue
+            is_student = member is not None and (
+                student_role_id is None or member.get_role(student_role_id) is not None
+            )
+            has_role = member is not None and member.get_role(inactive_role.id) is not None
+            if is_student and bool(inactive) != has_role:
+                if inactive:
+                    edit = partial(member.add_roles, inactive_role, reason="No activity")
+                else:
+                    edit = partial(member.remove_roles, inactive_role, reason="Active again")
+                try:
+                    await self.bot.outbound.run(Priority.DASHBOARD, ("roles", guild.id), edit)
+                except discord.HTTPException as e:
+                    print(f"[WARN] inactive role edit for {student_id} failed: {e}")
+                    continue
+                # The resolved member's roles are stale now
+                self.bot.member_resolver.forget(guild.id, student_id)
+                await asyncio.sleep(ROLE_EDIT_INTERVAL_SECONDS)
+            # Members who left or are no longer students are just marked, not edited
+            updates.append((inactive, guild.id, student_id))
+
+        if updates:
+            async with transaction() as db:
+                await db.executemany(
+                    "UPDATE student_activity SET inactive = ? WHERE guild_id = ? AND student_id = ?",
+                    updates,
+                )
+        if went_quiet or came_back:
+            print(
+                f"[INFO] inactivity in guild {guild.id}: "
+                f"{len(went_quiet)} went quiet, {len(came_back)} came back"
+            )
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(Inactivity(bot))
@@ -1,38 +1,202 @@
-import os
+import re
+import time
+import asyncio
+from dataclasses import dataclass
+from functools import partial
 import discord
 from discord.ext import commands
+from outbound import Priority, SendFailed
 
-GUILD_ID = int(os.getenv("GUILD_ID", "0"))
 HELP_CHANNEL_NAMES = {"help", "questions", "q-and-a"}
+WARNING_DELETE_AFTER = 20
+COALESCE_SECONDS = 2.0
+WARN_COOLDOWN_SECONDS = 60.0
+BULK_DELETE_LIMIT = 100
+WARNING_MAX_CHARS = 1900
+
+
+@dataclass(frozen=True, slots=True)
+class Rule:
+    name: str
+    action: str  # "delete", "warn" or "delete_warn"
+    warning: str = ""
+    words: frozenset[str] = frozenset()
+    pattern: re.Pattern | None = None
+    max_len: int = 0
+
+    def matches(self, content: str) -> bool:
+        # Cheap length bound first so long messages skip the string work
+        if self.max_len and len(content) > self.max_len:
+            return False
+        if self.words:
+            return content.strip().lower() in self.words
+        return bool(self.pattern and self.pattern.search(content))
+
+
+GREETING_RULE = Rule(
+    name="greeting",
+    action="delete_warn",
+    warning=(
+        "тук работим асинхронно. Пиши целия въпрос: контекст, очакван резултат, реален резултат, код. "
+        "Един 'hi' не е въпрос."
+    ),
+    words=frozenset({"hi", "hey", "hello", "zdr", "zdrasti"}),
+    max_len=64,
+)
+ASK_TO_ASK_RULE = Rule(
+    name="ask_to_ask",
+    action="warn",
+    warning="не питай дали може да питаш. Направо пиши въпроса с контекст и код.",
+    pattern=re.compile(
+        r"^\s*(има ли някой|може ли въпрос|anyone (here|online)|can i ask( a question)?)\s*\??\s*$",
+        re.IGNORECASE,
+    ),
+    max_len=64,
+)
+
+# (channel predicate, rules) pairs; a channel gets every rule whose predicate matches
+CHANNEL_POLICIES = (
+    (lambda ch: ch.name in HELP_CHANNEL_NAMES, (GREETING_RULE, ASK_TO_ASK_RULE)),
+    (lambda ch: "proj-" in ch.name, (GREETING_RULE,)),
+)
+
+
+def rules_for(channel: discord.abc.GuildChannel) -> tuple[Rule, ...]:
+    rules: list[Rule] = []
+    for predicate, policy_rules in CHANNEL_POLICIES:
+        if predicate(channel):
+            rules.extend(r for r in policy_rules if r not in rules)
+    return tuple(rules)
 
 
 class Moderation(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        # channel_id -> rules; channels without rules are simply absent
+        self.policies: dict[int, tuple[Rule, ...]] = {}
+        # channel_id -> offending messages waiting for the next coalesced flush
+        self.pending: dict[int, list[tuple[discord.Message, Rule]]] = {}
+        self.flush_tasks: set[asyncio.Task] = set()
+        self.warned_at: dict[int, float] = {}
+
+    async def cog_unload(self):
+        for task in self.flush_tasks:
+            task.cancel()
+
+    async def cog_load(self):
+        self.rebuild()
+
+    def rebuild(self):
+        self.policies = {}
+        for config in self.bot.guild_configs.all():
+            guild = self.bot.get_guild(config.guild_id)
+            if guild:
+                for channel in guild.text_channels:
+                    self.update_channel(channel)
+
+    def update_channel(self, channel: discord.abc.GuildChannel):
+        rules = rules_for(channel) if isinstance(channel, discord.TextChannel) else ()
+        if rules:
+            self.policies[channel.id] = rules
+        else:
+            self.policies.pop(channel.id, None)
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        self.rebuild()
+
+    @commands.Cog.listener()
+    async def on_guild_channel_create(self, channel: discord.abc.GuildChannel):
+        if channel.guild.id in self.bot.guild_configs:
+            self.update_channel(channel)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(
+        self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel
+    ):
+        if after.guild.id in self.bot.guild_configs:
+            self.update_channel(after)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        self.policies.pop(channel.id, None)
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
-        if message.author.bot:
-            return
-        if not message.guild or message.guild.id != GUILD_ID:
+        rules = self.policies.get(message.channel.id)
+        if not rules or message.author.bot:
             return
 
-        content = message.content.strip().lower()
-        if content in {"hi", "hey", "hello", "zdr", "zdrasti"}:
-            if (
-                message.channel.name in HELP_CHANNEL_NAMES
-                or "proj-" in message.channel.name
-            ):
-                try:
-                    await message.delete()
-                except discord.HTTPException:
-                    pass
-                await message.channel.send(
-                    f"{message.author.mention} "
-                    "тук работим асинхронно. Пиши целия въпрос: контекст, очакван резултат, реален резултат, код. "
-                    "Един 'hi' не е въпрос.",
-                    delete_after=20,
+        for rule in rules:
+            if rule.matches(message.content):
+                await self.apply(message, rule)
+                return
+
+    async def apply(self, message: discord.Message, rule: Rule):
+        # During a raid many offenders land within seconds; handle them in one go
+        batch = self.pending.get(message.channel.id)
+        if batch is None:
+            batch = self.pending[message.channel.id] = []
+            task = asyncio.create_task(self.flush_later(message.channel))
+            self.flush_tasks.add(task)
+            task.add_done_callback(self.flush_tasks.discard)
+        batch.append((message, rule))
+
+    async def flush_later(self, channel: discord.TextChannel):
+        await asyncio.sleep(COALESCE_SECONDS)
+        batch = self.pending.pop(channel.id, [])
+
+        to_delete = [m for m, rule in batch if rule.action in ("delete", "delete_warn")]
+        for i in range(0, len(to_delete), BULK_DELETE_LIMIT):
+            try:
+                await self.bot.outbound.run(
+                    Priority.MODERATION,
+                    ("channel", channel.id),
+                    partial(channel.delete_messages, to_delete[i : i + BULK_DELETE_LIMIT]),
+                )
+            except discord.HTTPException:
+                pass
+
+        now = time.monotonic()
+        if len(self.warned_at) > 1000:
+            self.warned_at = {
+                uid: t for uid, t in self.warned_at.items() if now - t < WARN_COOLDOWN_SECONDS
+            }
+
+        offenders: dict[Rule, dict[int, discord.abc.User]] = {}
+        for message, rule in batch:
+            if rule.action not in ("warn", "delete_warn"):
+                continue
+            author = message.author
+            if now - self.warned_at.get(author.id, float("-inf")) < WARN_COOLDOWN_SECONDS:
+                continue
+            self.warned_at[author.id] = now
+            offenders.setdefault(rule, {})[author.id] = author
+
+        warnings = []
+        for rule, authors in offenders.items():
+            mentions = ""
+            for author in authors.values():
+                if len(mentions) + len(author.mention) + len(rule.warning) > WARNING_MAX_CHARS:
+                    warnings.append(f"{mentions}{rule.warning}")
+                    mentions = ""
+                mentions += f"{author.mention} "
+            warnings.append(f"{mentions}{rule.warning}")
+
+        if warnings:
+            # Queued together, so short warnings are merged into fewer messages
+            try:
+                await self.bot.outbound.send_all(
+                    channel,
+                    Priority.MODERATION,
+                    [
+                        {"content": content, "delete_after": WARNING_DELETE_AFTER}
+                        for content in warnings
+                    ],
+                    coalesce=True,
                 )
+            except SendFailed:
+                pass
 
 
 async def setup(bot: commands.Bot):
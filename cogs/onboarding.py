@@ -1,15 +1,24 @@
 import os
+import io
+import re
+import csv
+import time
+import asyncio
 import discord
 from discord import app_commands
 from discord.ext import commands
-from db import get_db
+from db import read_db, transaction
+from outbound import Priority
 
-GUILD_ID = int(os.getenv("GUILD_ID", "0"))
 APPLICATIONS_CHANNEL_NAME = "applications"
+COHORT_CONCURRENCY = int(os.getenv("COHORT_CONCURRENCY", "5"))
+COHORT_PROGRESS_SECONDS = 3.0
+COHORT_CSV_MAX_BYTES = 256 * 1024
+MEMBER_TOKEN_RE = re.compile(r"<@!?\d+>|\d{15,20}")
 
 
 def is_admin(member: discord.Member, bot: commands.Bot) -> bool:
-    admin_id = getattr(bot, "core_roles", {}).get("admin")
+    admin_id = bot.guild_configs.roles(member.guild.id).get("admin")
     return bool(admin_id and any(r.id == admin_id for r in member.roles))
 
 
@@ -53,12 +62,27 @@ class ApplyModal(discord.ui.Modal):
             )
             return
 
+        # The reply doesn't depend on the side effects, so answer first
+        await interaction.response.send_message(
+            "Кандидатурата ти е изпратена. Ако си сериозен, ще разбереш. 🙂",
+            ephemeral=True,
+        )
+        self.bot.command_runner.observe_response(interaction, "apply_submit")
+        self.bot.command_runner.spawn(
+            interaction, self.save_application(interaction, guild), name="apply_submit"
+        )
+
+    async def save_application(self, interaction: discord.Interaction, guild: discord.Guild):
         # Ensure applications channel
         apps_channel = discord.utils.get(
             guild.text_channels, name=APPLICATIONS_CHANNEL_NAME
         )
         if apps_channel is None:
-            apps_channel = await guild.create_text_channel(APPLICATIONS_CHANNEL_NAME)
+            apps_channel = await self.bot.outbound.run(
+                Priority.INTERACTION,
+                ("channels", guild.id),
+                lambda: guild.create_text_channel(APPLICATIONS_CHANNEL_NAME),
+            )
 
         content = (
             f"**Нова кандидатура от {interaction.user.mention}**\n"
@@ -67,34 +91,32 @@ class ApplyModal(discord.ui.Modal):
             f"**GitHub:** {self.github.value}\n"
             f"**Опит:** {self.experience.value}"
         )
-        await apps_channel.send(content)
+        await self.bot.outbound.send(apps_channel, Priority.INTERACTION, content=content)
 
         # Save to DB
-        db = await get_db()
-        await db.execute(
-            """
-            INSERT OR REPLACE INTO users (id, github_username, is_student)
-            VALUES (
-                ?,
-                ?,
-                COALESCE((SELECT is_student FROM users WHERE id = ?), 0)
+        async with transaction() as db:
+            await db.execute(
+                """
+                INSERT OR REPLACE INTO users (id, github_username, is_student)
+                VALUES (
+                    ?,
+                    ?,
+                    COALESCE((SELECT is_student FROM users WHERE id = ?), 0)
+                )
+                """,
+                (interaction.user.id, self.github.value.strip(), interaction.user.id),
             )
-            """,
-            (interaction.user.id, self.github.value.strip(), interaction.user.id),
-        )
-        await db.commit()
 
         # Add Pending role
-        pending_id = self.bot.core_roles.get("pending")
+        pending_id = self.bot.guild_configs.roles(guild.id).get("pending")
         if pending_id:
             pending_role = guild.get_role(pending_id)
             if pending_role and pending_role not in interaction.user.roles:
-                await interaction.user.add_roles(pending_role)
-
-        await interaction.response.send_message(
-            "Кандидатурата ти е изпратена. Ако си сериозен, ще разбереш. 🙂",
-            ephemeral=True,
-        )
+                await self.bot.outbound.run(
+                    Priority.INTERACTION,
+                    ("roles", guild.id),
+                    lambda: interaction.user.add_roles(pending_role),
+                )
 
 
 class Onboarding(commands.Cog):
@@ -105,7 +127,6 @@ class Onboarding(commands.Cog):
         name="apply",
         description="Кандидатстване за DevForge BG менторската програма.",
     )
-    @app_commands.guilds(discord.Object(id=GUILD_ID))
     async def apply(self, interaction: discord.Interaction):
         await interaction.response.send_modal(ApplyModal(self.bot))
 
@@ -114,42 +135,188 @@ class Onboarding(commands.Cog):
         description="Одобряване на кандидат (Admin only).",
     )
     @app_commands.describe(user="Кой потребител да бъде одобрен.")
-    @app_commands.guilds(discord.Object(id=GUILD_ID))
     async def approve(self, interaction: discord.Interaction, user: discord.Member):
         if not is_admin(interaction.user, self.bot):
             await interaction.response.send_message("Нямаш права.", ephemeral=True)
             return
 
-        guild = interaction.guild
-        pending_id = self.bot.core_roles.get("pending")
-        student_id = self.bot.core_roles.get("student")
+        await self.bot.command_runner.run_deferred(
+            interaction, self.approve_student(interaction.guild, user), ephemeral=False
+        )
+
+    async def approve_student(self, guild: discord.Guild, user: discord.Member) -> str:
+        await self.grant_student(guild, user, Priority.INTERACTION)
+
+        async with transaction() as db:
+            await db.execute(
+                "UPDATE users SET is_student = 1 WHERE id = ?",
+                (user.id,),
+            )
+
+        await self.welcome(user, Priority.INTERACTION)
+        return f"{user.mention} вече е 🎓 Student."
+
+    async def grant_student(self, guild: discord.Guild, user: discord.Member, priority: Priority):
+        roles = self.bot.guild_configs.roles(guild.id)
+        pending_id = roles.get("pending")
+        student_id = roles.get("student")
 
         pending = guild.get_role(pending_id) if pending_id else None
         student = guild.get_role(student_id) if student_id else None
 
+        outbound = self.bot.outbound
         if pending and pending in user.roles:
-            await user.remove_roles(pending)
+            await outbound.run(priority, ("roles", guild.id), lambda: user.remove_roles(pending))
         if student and student not in user.roles:
-            await user.add_roles(student)
-
-        db = await get_db()
-        await db.execute(
-            "UPDATE users SET is_student = 1 WHERE id = ?",
-            (user.id,),
-        )
-        await db.commit()
-
-        await interaction.response.send_message(
-            f"{user.mention} вече е 🎓 Student.", ephemeral=False
-        )
+            await outbound.run(priority, ("roles", guild.id), lambda: user.add_roles(student))
+            # Uncached members get no member_update, so the new student's clock starts here
+            self.bot.member_resolver.forget(guild.id, user.id)
+            inactivity = self.bot.get_cog("Inactivity")
+            if inactivity:
+                inactivity.touch(guild.id, user.id)
 
+    async def welcome(self, user: discord.Member, priority: Priority):
         try:
-            await user.send(
-                "Одобрен си за DevForge BG. Запознай се със структурата на сървъра и се дръж като човек, който иска да стане инженер."
+            await self.bot.outbound.send(
+                user,
+                priority,
+                content="Одобрен си за DevForge BG. Запознай се със структурата на сървъра и се дръж като човек, който иска да стане инженер.",
             )
         except discord.HTTPException:
             pass
 
+    @app_commands.command(
+        name="cohort_onboard",
+        description="Одобри и създай пространства за цял випуск (Admin only).",
+    )
+    @app_commands.describe(
+        members="Споменавания или ID-та, разделени с интервал.",
+        csv_file="CSV с ID-та или потребителски имена (по едно на клетка).",
+        resume="ID на предишно пускане: повтори само неуспелите.",
+    )
+    async def cohort_onboard(
+        self,
+        interaction: discord.Interaction,
+        members: str | None = None,
+        csv_file: discord.Attachment | None = None,
+        resume: str | None = None,
+    ):
+        if not is_admin(interaction.user, self.bot):
+            await interaction.response.send_message("Нямаш права.", ephemeral=True)
+            return
+
+        guild = interaction.guild
+        students = self.bot.get_cog("Students")
+        if guild is None or students is None:
+            await interaction.response.send_message("Грешка с guild.", ephemeral=True)
+            return
+
+        await self.bot.command_runner.defer(interaction)
+
+        tokens = MEMBER_TOKEN_RE.findall(members or "")
+        if csv_file is not None:
+            if csv_file.size > COHORT_CSV_MAX_BYTES:
+                await interaction.edit_original_response(content="CSV файлът е твърде голям.")
+                return
+            text = (await csv_file.read()).decode("utf-8-sig", errors="replace")
+            tokens += [cell.strip() for row in csv.reader(io.StringIO(text)) for cell in row]
+
+        run_id = interaction.id
+        if resume:
+            if not resume.isdigit():
+                await interaction.edit_original_response(content="Невалидно ID за resume.")
+                return
+            run_id = int(resume)
+            async with read_db() as db:
+                cur = await db.execute(
+                    "SELECT member_id FROM cohort_members WHERE run_id = ? AND status != 'done'",
+                    (run_id,),
+                )
+                tokens += [str(row[0]) for row in await cur.fetchall()]
+
+        targets: dict[int, discord.Member] = {}
+        unresolved = []
+        for token in dict.fromkeys(t.strip("<@!>") for t in tokens if t.strip()):
+            member = await self.resolve_member(guild, token)
+            if member is None:
+                unresolved.append(token)
+            else:
+                targets[member.id] = member
+
+        if not targets:
+            await interaction.edit_original_response(content="Няма валидни членове за обработка.")
+            return
+
+        sem = asyncio.Semaphore(COHORT_CONCURRENCY)
+        results: dict[int, tuple[int | None, str | None]] = {}
+        last_report = 0.0
+
+        async def provision(member: discord.Member):
+            nonlocal last_report
+            async with sem:
+                try:
+                    # Bulk provisioning yields to interactive commands
+                    await self.grant_student(guild, member, Priority.DASHBOARD)
+                    category = await students.provision_space(
+                        guild, member, interaction.user, Priority.DASHBOARD
+                    )
+                    await self.welcome(member, Priority.DASHBOARD)
+                    results[member.id] = (category.id, None)
+                except Exception as e:
+                    results[member.id] = (None, repr(e))
+
+            # Progress edits share the rate-limit budget, so throttle them
+            now = time.monotonic()
+            if now - last_report >= COHORT_PROGRESS_SECONDS:
+                last_report = now
+                failed = sum(1 for _, err in results.values() if err)
+                try:
+                    await interaction.edit_original_response(
+                        content=f"Прогрес: {len(results)}/{len(targets)}, грешки: {failed}"
+                    )
+                except discord.HTTPException:
+                    pass
+
+        await asyncio.gather(*(provision(m) for m in targets.values()))
+
+        done = [(uid, cat_id) for uid, (cat_id, err) in results.items() if err is None]
+        async with transaction() as db:
+            await db.executemany(
+                "UPDATE users SET is_student = 1 WHERE id = ?",
+                [(uid,) for uid, _ in done],
+            )
+            await self.bot.topology.save_student_categories(db, done)
+            await db.executemany(
+                """
+                INSERT OR REPLACE INTO cohort_members (run_id, member_id, status, error)
+                VALUES (?, ?, ?, ?)
+                """,
+                [
+                    (run_id, uid, "failed" if err else "done", err)
+                    for uid, (_, err) in results.items()
+                ],
+            )
+
+        failed = [uid for uid, (_, err) in results.items() if err]
+        summary = f"Готово: {len(done)}/{len(targets)} одобрени и с пространство."
+        if failed:
+            summary += (
+                f"\nНеуспешни: {' '.join(f'<@{uid}>' for uid in failed)}"
+                f"\nПовтори с `/cohort_onboard resume:{run_id}`."
+            )
+        if unresolved:
+            summary += f"\nНе са намерени: {', '.join(unresolved[:20])}"
+        await interaction.edit_original_response(content=summary[:2000])
+
+    async def resolve_member(self, guild: discord.Guild, token: str) -> discord.Member | None:
+        resolver = self.bot.member_resolver
+        if token.isdigit():
+            try:
+                return await resolver.resolve(guild, int(token))
+            except discord.HTTPException:
+                return None
+        return await resolver.resolve_named(guild, token)
+
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(Onboarding(bot))
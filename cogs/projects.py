@@ -1,38 +1,115 @@
-import os
 import re
+import datetime
 import discord
 from discord import app_commands
-from discord.ext import commands
-from db import get_db
+from discord.ext import commands, tasks
+from db import read_db, transaction, get_state, set_state
+from project_index import Project, log_transition
+from execution import CommandFailed
+from guild_config import GuildConfig
+from outbound import Priority, SendFailed
+from fulltext import record_feedback
 
-GUILD_ID = int(os.getenv("GUILD_ID", "0"))
 REPO_RE = re.compile(r"github\.com/([^\/\s]+\/[^\/\s]+)")
+REVIEW_SLA_CHECK_MINUTES = 15
+REVIEW_PAGE_SIZE = 10
+REVIEW_PING_MAX_CHARS = 1900
+# Leaves room for the header and status line within Discord's 2000-character message
+FEEDBACK_MAX_CHARS = 1800
+# Format of CURRENT_TIMESTAMP, which is what projects.updated_at holds (UTC)
+SQLITE_TIME = "%Y-%m-%d %H:%M:%S"
 
 
 def is_admin(member: discord.Member, bot: commands.Bot) -> bool:
-    admin_id = getattr(bot, "core_roles", {}).get("admin")
+    admin_id = bot.guild_configs.roles(member.guild.id).get("admin")
     return bool(admin_id and any(r.id == admin_id for r in member.roles))
 
 
+def review_line(row: tuple, overdue_before: str) -> str:
+    project_id, student_id, channel_id, title, updated_at = row
+    waiting_since = datetime.datetime.strptime(updated_at, SQLITE_TIME).replace(
+        tzinfo=datetime.timezone.utc
+    )
+    flag = "⏰ " if updated_at <= overdue_before else ""
+    return (
+        f"{flag}<#{channel_id}> **{title}** · <@{student_id}> · "
+        f"чака от {discord.utils.format_dt(waiting_since, 'R')}"
+    )
+
+
+def sla_cutoff(hours: float) -> str:
+    cutoff = discord.utils.utcnow() - datetime.timedelta(hours=hours)
+    return cutoff.strftime(SQLITE_TIME)
+
+
+async def fetch_review_page(guild_id: int, after: tuple[str, int] = ("", 0)) -> list[tuple]:
+    # Keyset pagination over (updated_at, id); one extra row says whether a next page exists
+    async with read_db() as db:
+        cur = await db.execute(
+            """
+            SELECT id, student_id, channel_id, title, updated_at FROM projects
+            WHERE guild_id = ? AND status = 'awaiting_review' AND (updated_at, id) > (?, ?)
+            ORDER BY updated_at, id
+            LIMIT ?
+            """,
+            (guild_id, *after, REVIEW_PAGE_SIZE + 1),
+        )
+        return await cur.fetchall()
+
+
+class ReviewQueueView(discord.ui.View):
+    def __init__(self, config: GuildConfig, rows: list[tuple]):
+        super().__init__(timeout=300)
+        self.config = config
+        self.rows = rows
+        self.page = 1
+        self.next_page.disabled = len(rows) <= REVIEW_PAGE_SIZE
+
+    def render(self) -> str:
+        if not self.rows:
+            return "Няма проекти, които чакат ревю."
+        cutoff = sla_cutoff(self.config.review_sla_hours)
+        lines = [review_line(row, cutoff) for row in self.rows[:REVIEW_PAGE_SIZE]]
+        return f"**Чакат ревю** (стр. {self.page}, най-старите първо):\n" + "\n".join(lines)
+
+    @discord.ui.button(label="Следващи", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        last = self.rows[REVIEW_PAGE_SIZE - 1]
+        self.rows = await fetch_review_page(self.config.guild_id, (last[4], last[0]))
+        self.page += 1
+        button.disabled = len(self.rows) <= REVIEW_PAGE_SIZE
+        await interaction.response.edit_message(content=self.render(), view=self)
+
+
 class Projects(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
 
+    async def cog_load(self):
+        self.review_sla.start()
+
+    async def cog_unload(self):
+        self.review_sla.cancel()
+
     async def _ensure_project_channel(
         self, guild: discord.Guild, user: discord.Member, short_name: str
     ) -> discord.TextChannel:
-        cat_name = f"student-{user.name}".lower()
-        category = discord.utils.get(guild.categories, name=cat_name)
+        category = self.bot.topology.student_category(guild, user)
         if category is None:
-            raise RuntimeError("Няма категория за този студент. Използвай /student_init.")
+            raise CommandFailed("Няма категория за този студент. Използвай /student_init.")
 
         ch_name = f"proj-{short_name}".lower().replace(" ", "-")
-        channel = discord.utils.get(category.text_channels, name=ch_name)
+        channel = self.bot.topology.channel(category, ch_name)
         if channel is None:
             overwrites = category.overwrites
-            channel = await guild.create_text_channel(
-                ch_name, category=category, overwrites=overwrites
+            channel = await self.bot.outbound.run(
+                Priority.INTERACTION,
+                ("channels", guild.id),
+                lambda: guild.create_text_channel(
+                    ch_name, category=category, overwrites=overwrites
+                ),
             )
+            self.bot.topology.add(channel)
         return channel
 
     @app_commands.command(
@@ -45,7 +122,6 @@ class Projects(commands.Cog):
         difficulty="Размер / ниво (S/M/L)",
         focus="Фокус (backend, security, etc.)",
     )
-    @app_commands.guilds(discord.Object(id=GUILD_ID))
     async def project_assign(
         self,
         interaction: discord.Interaction,
@@ -72,14 +148,26 @@ class Projects(commands.Cog):
             )
             return
 
-        repo_full_name = m.group(1)
-        short_name = title.split()[0]
+        await self.bot.command_runner.run_deferred(
+            interaction,
+            self.create_project(
+                guild, user, title, repo_url, m.group(1), difficulty, focus, interaction.user.id
+            ),
+        )
 
-        try:
-            channel = await self._ensure_project_channel(guild, user, short_name)
-        except RuntimeError as e:
-            await interaction.response.send_message(str(e), ephemeral=True)
-            return
+    async def create_project(
+        self,
+        guild: discord.Guild,
+        user: discord.Member,
+        title: str,
+        repo_url: str,
+        repo_full_name: str,
+        difficulty: str,
+        focus: str,
+        actor_id: int,
+    ) -> str:
+        short_name = title.split()[0]
+        channel = await self._ensure_project_channel(guild, user, short_name)
 
         embed = discord.Embed(
             title=f"Проект: {title}",
@@ -104,171 +192,259 @@ class Projects(commands.Cog):
             inline=False,
         )
 
-        await channel.send(embed=embed)
-
-        db = await get_db()
-        cur = await db.execute(
-            """
-            INSERT INTO projects (student_id, channel_id, title, repo_url, status)
-            VALUES (?, ?, ?, ?, 'in_progress')
-            """,
-            (user.id, channel.id, title, repo_url),
-        )
-        await db.commit()
-        project_id = cur.lastrowid
+        await self.bot.outbound.send(channel, Priority.INTERACTION, embed=embed)
 
-        await db.execute(
-            """
-            INSERT OR IGNORE INTO repos (repo_full_name, channel_id)
-            VALUES (?, ?)
-            """,
-            (repo_full_name, channel.id),
+        async with transaction() as db:
+            cur = await db.execute(
+                """
+                INSERT INTO projects (student_id, channel_id, title, repo_url, status, guild_id)
+                VALUES (?, ?, ?, ?, 'in_progress', ?)
+                """,
+                (user.id, channel.id, title, repo_url, guild.id),
+            )
+            project_id = cur.lastrowid
+            await log_transition(db, project_id, None, "in_progress", actor_id)
+
+            cur = await db.execute(
+                """
+                INSERT OR IGNORE INTO repos (repo_full_name, channel_id)
+                VALUES (?, ?)
+                """,
+                (repo_full_name, channel.id),
+            )
+            repo_added = cur.rowcount
+        if repo_added:
+            self.bot.repo_routes.set(repo_full_name, channel.id)
+        self.bot.project_index.add(
+            Project(project_id, user.id, channel.id, title, "in_progress", guild.id)
         )
-        await db.commit()
 
-        await interaction.response.send_message(
-            f"Проект `{title}` създаден за {user.mention} в {channel.mention} (id={project_id}).",
-            ephemeral=True,
-        )
+        return f"Проект `{title}` създаден за {user.mention} в {channel.mention} (id={project_id})."
 
     @app_commands.command(
         name="project_mark_done",
         description="Студент: отбележи проекта като готов за ревю.",
     )
-    @app_commands.guilds(discord.Object(id=GUILD_ID))
     async def project_mark_done(self, interaction: discord.Interaction):
-        channel_id = interaction.channel.id
-        db = await get_db()
-        cur = await db.execute(
-            """
-            SELECT id FROM projects
-            WHERE channel_id = ?
-            ORDER BY id DESC LIMIT 1
-            """,
-            (channel_id,),
-        )
-        row = await cur.fetchone()
-        if not row:
+        project = self.bot.project_index.get(interaction.channel.id)
+        if project is None:
             await interaction.response.send_message(
                 "Това не е проектен канал.", ephemeral=True
             )
             return
 
-        await db.execute(
-            """
-            UPDATE projects
-            SET status = 'awaiting_review', updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-            """,
-            (row[0],),
-        )
-        await db.commit()
-
         await interaction.response.send_message(
             "Маркирано като 'готово за ревю'. Очаквай обратна връзка.",
             ephemeral=True,
         )
+        self.bot.command_runner.observe_response(interaction)
+        await self.bot.project_index.set_status(project, "awaiting_review", interaction.user.id)
 
     @app_commands.command(
         name="project_feedback",
         description="Менторски feedback за текущия проектен канал.",
     )
     @app_commands.describe(issues="Проблеми, насоки, следващи стъпки.")
-    @app_commands.guilds(discord.Object(id=GUILD_ID))
     async def project_feedback(
-        self, interaction: discord.Interaction, issues: str
+        self,
+        interaction: discord.Interaction,
+        issues: app_commands.Range[str, 1, FEEDBACK_MAX_CHARS],
     ):
         if not is_admin(interaction.user, self.bot):
             await interaction.response.send_message("Нямаш права.", ephemeral=True)
             return
 
-        channel_id = interaction.channel.id
-        db = await get_db()
-        cur = await db.execute(
-            """
-            SELECT id FROM projects
-            WHERE channel_id = ?
-            ORDER BY id DESC LIMIT 1
-            """,
-            (channel_id,),
-        )
-        row = await cur.fetchone()
-        if not row:
+        project = self.bot.project_index.get(interaction.channel.id)
+        if project is None:
             await interaction.response.send_message(
                 "Това не е проектен канал.", ephemeral=True
             )
             return
 
-        await db.execute(
-            """
-            UPDATE projects
-            SET status = 'in_progress', updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-            """,
-            (row[0],),
-        )
-        await db.commit()
-
-        await interaction.channel.send(
-            f"**Review от {interaction.user.mention}:**\n{issues}\n\n"
-            f"Статус: 🔁 Iteration in progress."
+        # Saved before posting, so a failed send can't lose the review
+        await self.bot.project_index.set_status(
+            project,
+            "in_progress",
+            interaction.user.id,
+            writes=lambda db: record_feedback(db, project, interaction.user.id, issues),
         )
         await interaction.response.send_message(
             "Feedback публикуван.", ephemeral=True
         )
+        self.bot.command_runner.observe_response(interaction)
+
+        try:
+            await self.bot.outbound.send(
+                interaction.channel,
+                Priority.INTERACTION,
+                content=(
+                    f"**Review от {interaction.user.mention}:**\n{issues}\n\n"
+                    f"Статус: 🔁 Iteration in progress."
+                ),
+            )
+        except discord.HTTPException as e:
+            print(f"[WARN] feedback post in {interaction.channel.id} failed: {e}")
+            await self.bot.outbound.run(
+                Priority.INTERACTION,
+                ("interaction", interaction.id),
+                lambda: interaction.followup.send(
+                    f"Feedback-ът е записан, но не успях да го публикувам в канала: {e.text or e}",
+                    ephemeral=True,
+                ),
+            )
 
     @app_commands.command(
         name="project_approve",
         description="Маркирай проекта в този канал като production-ready.",
     )
-    @app_commands.guilds(discord.Object(id=GUILD_ID))
     async def project_approve(self, interaction: discord.Interaction):
         if not is_admin(interaction.user, self.bot):
             await interaction.response.send_message("Нямаш права.", ephemeral=True)
             return
 
-        channel_id = interaction.channel.id
-        db = await get_db()
-        cur = await db.execute(
-            """
-            SELECT id, student_id, title FROM projects
-            WHERE channel_id = ?
-            ORDER BY id DESC LIMIT 1
-            """,
-            (channel_id,),
-        )
-        row = await cur.fetchone()
-        if not row:
+        project = self.bot.project_index.get(interaction.channel.id)
+        if project is None:
             await interaction.response.send_message(
                 "Това не е проектен канал.", ephemeral=True
             )
             return
 
-        project_id, student_id, title = row
-
-        await db.execute(
-            """
-            UPDATE projects
-            SET status = 'approved', updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-            """,
-            (project_id,),
+        await interaction.response.send_message(
+            "Проектът е маркиран като одобрен.", ephemeral=True
         )
-        await db.commit()
+        self.bot.command_runner.observe_response(interaction)
 
         guild = interaction.guild
-        student = guild.get_member(student_id) if guild else None
+        try:
+            student = (
+                await self.bot.member_resolver.resolve(guild, project.student_id) if guild else None
+            )
+        except discord.HTTPException as e:
+            print(f"[WARN] fetch of student {project.student_id} failed: {e}")
+            student = None
 
         if student:
-            await interaction.channel.send(
-                f"✅ {student.mention}, проектът **'{title}'** е одобрен като production-ready.\n"
-                f"Спокойно го слагай в CV/LinkedIn."
+            await self.bot.outbound.send(
+                interaction.channel,
+                Priority.INTERACTION,
+                content=(
+                    f"✅ {student.mention}, проектът **'{project.title}'** е одобрен като production-ready.\n"
+                    f"Спокойно го слагай в CV/LinkedIn."
+                ),
             )
+        await self.bot.project_index.set_status(project, "approved", interaction.user.id)
 
-        await interaction.response.send_message(
-            "Проектът е маркиран като одобрен.", ephemeral=True
+    @app_commands.command(
+        name="projects_board",
+        description="Закачи табло с проектите по статус в този канал (Admin only).",
+    )
+    @app_commands.describe(remove="Премахни таблото от този канал.")
+    async def projects_board(self, interaction: discord.Interaction, remove: bool = False):
+        if not is_admin(interaction.user, self.bot):
+            await interaction.response.send_message("Нямаш права.", ephemeral=True)
+            return
+
+        board = self.bot.project_board
+        if remove:
+            await board.detach(interaction.channel.id)
+            await interaction.response.send_message(
+                "Таблото вече не се обновява тук.", ephemeral=True
+            )
+            return
+
+        await self.bot.command_runner.run_deferred(
+            interaction, self.attach_board(interaction.channel)
         )
 
+    async def attach_board(self, channel: discord.TextChannel) -> str:
+        await self.bot.project_board.attach(channel)
+        return f"Таблото с проекти е закачено в {channel.mention}."
+
+    @app_commands.command(
+        name="review_queue",
+        description="Проекти, които чакат ревю, най-старите първо (Admin only).",
+    )
+    async def review_queue(self, interaction: discord.Interaction):
+        if not is_admin(interaction.user, self.bot):
+            await interaction.response.send_message("Нямаш права.", ephemeral=True)
+            return
+
+        config = self.bot.guild_configs.get(interaction.guild_id)
+        view = ReviewQueueView(config, await fetch_review_page(config.guild_id))
+        await interaction.response.send_message(view.render(), view=view, ephemeral=True)
+
+    @tasks.loop(minutes=REVIEW_SLA_CHECK_MINUTES)
+    async def review_sla(self):
+        for config in self.bot.guild_configs.all():
+            try:
+                await self.check_review_sla(config)
+            except Exception as e:
+                print(f"[ERROR] review SLA check for guild {config.guild_id}: {e!r}")
+
+    @review_sla.before_loop
+    async def before_review_sla(self):
+        await self.bot.wait_until_ready()
+
+    async def check_review_sla(self, config: GuildConfig):
+        cutoff = sla_cutoff(config.review_sla_hours)
+        # Each run only sees projects that crossed the SLA since the previous run
+        key = f"review_sla_cutoff:{config.guild_id}"
+        since = await get_state(key) or ""
+        async with read_db() as db:
+            cur = await db.execute(
+                """
+                SELECT id, student_id, channel_id, title, updated_at FROM projects
+                WHERE guild_id = ? AND status = 'awaiting_review'
+                    AND updated_at > ? AND updated_at <= ?
+                ORDER BY updated_at, id
+                """,
+                (config.guild_id, since, cutoff),
+            )
+            rows = await cur.fetchall()
+        # Unsent pings keep the old cutoff, so the next run picks them up again
+        if rows and not await self.ping_overdue(config, rows, cutoff):
+            return
+        await set_state(key, cutoff)
+
+    async def ping_overdue(self, config: GuildConfig, rows: list[tuple], cutoff: str) -> bool:
+        # Dashboard channels are where mentors watch projects
+        channels = [
+            channel
+            for channel in map(self.bot.get_channel, self.bot.project_board.boards)
+            if channel is not None and channel.guild.id == config.guild_id
+        ]
+        if not channels:
+            print(
+                f"[WARN] {len(rows)} review(s) over SLA in guild {config.guild_id} "
+                f"but no /projects_board channel to ping"
+            )
+            return False
+
+        mentor_id = config.roles.get("mentor")
+        header = f"<@&{mentor_id}> " if mentor_id else ""
+        header += f"Тези проекти чакат ревю повече от {config.review_sla_hours:g} ч:"
+        messages = [header]
+        for row in rows:
+            line = review_line(row, cutoff)
+            if len(messages[-1]) + len(line) + 1 > REVIEW_PING_MAX_CHARS:
+                messages.append("")
+            messages[-1] += ("\n" if messages[-1] else "") + line
+
+        sent = False
+        for channel in channels:
+            try:
+                await self.bot.outbound.send_all(
+                    channel,
+                    Priority.DASHBOARD,
+                    [{"content": content} for content in messages],
+                    coalesce=True,
+                )
+            except SendFailed as e:
+                print(f"[WARN] review SLA ping in {channel.id} failed: {e}")
+            else:
+                sent = True
+        return sent
+
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(Projects(bot))
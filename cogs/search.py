@@ -0,0 +1,117 @@
+import time
+from typing import Literal
+import discord
+from discord import app_commands
+from discord.ext import commands
+from fulltext import search_commits, search_feedback
+
+SEARCH_RESULTS = 8
+SEARCH_DESCRIPTION_CHARS = 4000
+
+
+def is_admin(member: discord.Member, bot: commands.Bot) -> bool:
+    admin_id = bot.guild_configs.roles(member.guild.id).get("admin")
+    return bool(admin_id and any(r.id == admin_id for r in member.roles))
+
+
+def one_line(snippet: str) -> str:
+    return " ".join(snippet.split())
+
+
+class Search(commands.Cog):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    @app_commands.command(
+        name="search",
+        description="Търси в review feedback и commit съобщения (Admin only).",
+    )
+    @app_commands.describe(
+        query="Думи за търсене, напр. sql injection.",
+        student="Само за този студент.",
+        project="Само за проекта в този канал.",
+        scope="Къде да търси.",
+    )
+    async def search(
+        self,
+        interaction: discord.Interaction,
+        query: app_commands.Range[str, 1, 200],
+        student: discord.Member | None = None,
+        project: discord.TextChannel | None = None,
+        scope: Literal["all", "feedback", "commits"] = "all",
+    ):
+        if not is_admin(interaction.user, self.bot):
+            await interaction.response.send_message("Нямаш права.", ephemeral=True)
+            return
+
+        project_row = None
+        if project is not None:
+            project_row = self.bot.project_index.get(project.id)
+            if project_row is None:
+                await interaction.response.send_message(
+                    f"{project.mention} не е проектен канал.", ephemeral=True
+                )
+                return
+
+        start = time.perf_counter()
+        student_id = student.id if student else None
+        feedback = commits = []
+        if scope in ("all", "feedback"):
+            feedback = await search_feedback(
+                interaction.guild_id,
+                query,
+                student_id,
+                project_row.id if project_row else None,
+                SEARCH_RESULTS,
+            )
+        if scope in ("all", "commits"):
+            commits = await search_commits(
+                interaction.guild_id,
+                query,
+                student_id,
+                project_row.channel_id if project_row else None,
+                SEARCH_RESULTS,
+            )
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        if not feedback and not commits:
+            await interaction.response.send_message(
+                f"Нищо не е намерено за „{query}“.", ephemeral=True
+            )
+            return
+
+        lines = []
+        if feedback:
+            lines.append("__**Feedback**__")
+            for project_id, owner_id, author_id, created_at, snippet in feedback:
+                lines.append(
+                    f"проект #{project_id} · <@{owner_id}> · от <@{author_id}> · {created_at[:10]}\n"
+                    f"> {one_line(snippet)}"
+                )
+        if commits:
+            lines.append("__**Commits**__")
+            for repo, sha, owner_id, day, snippet in commits:
+                owner = f" · <@{owner_id}>" if owner_id else ""
+                lines.append(
+                    f"[`{repo}@{sha[:7]}`](https://github.com/{repo}/commit/{sha}){owner} · {day}\n"
+                    f"> {one_line(snippet)}"
+                )
+
+        description = ""
+        for line in lines:
+            if len(description) + len(line) + 1 > SEARCH_DESCRIPTION_CHARS:
+                description += "\n…"
+                break
+            description += ("\n" if description else "") + line
+
+        embed = discord.Embed(
+            title=f"Резултати за „{query}“",
+            description=description,
+            color=discord.Color.blurple(),
+        )
+        embed.set_footer(text=f"{len(feedback) + len(commits)} резултата · {elapsed_ms:.0f} ms")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(Search(bot))
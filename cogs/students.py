@@ -1,14 +1,14 @@
-import os
+from typing import Literal
 import discord
 from discord import app_commands
 from discord.ext import commands
-from db import get_db
-
-GUILD_ID = int(os.getenv("GUILD_ID", "0"))
+from db import transaction
+from activity import top_contributors
+from outbound import Priority
 
 
 def is_admin(member: discord.Member, bot: commands.Bot) -> bool:
-    admin_id = getattr(bot, "core_roles", {}).get("admin")
+    admin_id = bot.guild_configs.roles(member.guild.id).get("admin")
     return bool(admin_id and any(r.id == admin_id for r in member.roles))
 
 
@@ -16,64 +16,120 @@ class Students(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
 
-    @app_commands.command(
-        name="student_init",
-        description="Създай категория и лично пространство за студент.",
-    )
-    @app_commands.describe(user="Студентът")
-    @app_commands.guilds(discord.Object(id=GUILD_ID))
-    async def student_init(self, interaction: discord.Interaction, user: discord.Member):
-        if not is_admin(interaction.user, self.bot):
-            await interaction.response.send_message("Нямаш права.", ephemeral=True)
-            return
-
-        guild = interaction.guild
-        if guild is None:
-            await interaction.response.send_message("Грешка с guild.", ephemeral=True)
-            return
-
+    async def provision_space(
+        self,
+        guild: discord.Guild,
+        user: discord.Member,
+        mentor: discord.Member,
+        priority: Priority,
+    ) -> discord.CategoryChannel:
         cat_name = f"student-{user.name}".lower()
-        category = discord.utils.get(guild.categories, name=cat_name)
+        category = self.bot.topology.student_category(guild, user)
 
         overwrites = {
             guild.default_role: discord.PermissionOverwrite(view_channel=False),
             user: discord.PermissionOverwrite(
                 view_channel=True, send_messages=True, read_message_history=True
             ),
-            interaction.user: discord.PermissionOverwrite(
+            mentor: discord.PermissionOverwrite(
                 view_channel=True, send_messages=True, read_message_history=True
             ),
         }
 
+        outbound = self.bot.outbound
         if category is None:
-            category = await guild.create_category(cat_name, overwrites=overwrites)
+            category = await outbound.run(
+                priority,
+                ("channels", guild.id),
+                lambda: guild.create_category(cat_name, overwrites=overwrites),
+            )
+            self.bot.topology.add(category)
         else:
-            await category.edit(overwrites=overwrites)
+            await outbound.run(
+                priority, ("channel", category.id), lambda: category.edit(overwrites=overwrites)
+            )
 
-        profile = discord.utils.get(category.text_channels, name="profile")
+        profile = self.bot.topology.channel(category, "profile")
         if profile is None:
-            profile = await guild.create_text_channel("profile", category=category)
-
-        await profile.send(
-            f"{user.mention}, това е твоето лично пространство.\n"
+            profile = await outbound.run(
+                priority,
+                ("channels", guild.id),
+                lambda: guild.create_text_channel("profile", category=category),
+            )
+            self.bot.topology.add(profile)
+
+        await outbound.send(
+            profile,
+            priority,
+            content=f"{user.mention}, това е твоето лично пространство.\n"
             f"Напиши тук:\n"
             f"- какъв опит имаш\n"
             f"- какво искаш да учиш / строиш\n"
             f"- колко часа седмично можеш да отделяш\n"
-            f"- линк към GitHub."
+            f"- линк към GitHub.",
         )
 
-        db = await get_db()
-        await db.execute(
-            "INSERT OR IGNORE INTO users (id, is_student) VALUES (?, 1)",
-            (user.id,),
+        return category
+
+    @app_commands.command(
+        name="student_init",
+        description="Създай категория и лично пространство за студент.",
+    )
+    @app_commands.describe(user="Студентът")
+    async def student_init(self, interaction: discord.Interaction, user: discord.Member):
+        if not is_admin(interaction.user, self.bot):
+            await interaction.response.send_message("Нямаш права.", ephemeral=True)
+            return
+
+        guild = interaction.guild
+        if guild is None:
+            await interaction.response.send_message("Грешка с guild.", ephemeral=True)
+            return
+
+        await self.bot.command_runner.run_deferred(
+            interaction, self.init_space(guild, user, interaction.user)
         )
-        await db.commit()
 
-        await interaction.response.send_message(
-            f"Инициализирано пространство за {user.mention}.",
-            ephemeral=True,
+    async def init_space(
+        self, guild: discord.Guild, user: discord.Member, mentor: discord.Member
+    ) -> str:
+        category = await self.provision_space(guild, user, mentor, Priority.INTERACTION)
+        async with transaction() as db:
+            await self.bot.topology.save_student_categories(db, [(user.id, category.id)])
+        return f"Инициализирано пространство за {user.mention}."
+
+    @app_commands.command(
+        name="leaderboard",
+        description="Най-активните по commits за последните дни.",
+    )
+    @app_commands.describe(
+        days="Колко дни назад (1-90).",
+        by="Класиране по студент, repo или автор на commit.",
+    )
+    async def leaderboard(
+        self,
+        interaction: discord.Interaction,
+        days: app_commands.Range[int, 1, 90] = 7,
+        by: Literal["student", "repo", "author"] = "student",
+    ):
+        # Reads the daily rollups only; commit_events is never scanned here
+        rows = await top_contributors(interaction.guild_id, by, days)
+        if not rows:
+            await interaction.response.send_message(
+                f"Няма commits за последните {days} дни.", ephemeral=True
+            )
+            return
+
+        lines = []
+        for rank, (key, total) in enumerate(rows, start=1):
+            name = f"<@{key}>" if by == "student" else f"`{key}`"
+            lines.append(f"**{rank}.** {name} · {total} commit(s)")
+        embed = discord.Embed(
+            title=f"Класиране за последните {days} дни",
+            description="\n".join(lines),
+            color=discord.Color.blurple(),
         )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
 
 
 async def setup(bot: commands.Bot):
@@ -1,9 +1,32 @@
+import os
+import re
+import ast
+import sys
+import glob
+import time
+import sqlite3
 import aiosqlite
 import asyncio
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from metrics import METRICS_ENABLED, FAST_BUCKETS, Histogram
 
-DB_PATH = "devforge.db"
+DB_PATH = os.getenv("DB_PATH", "devforge.db")
+DB_READERS = int(os.getenv("DB_READERS", "3"))
 
-SCHEMA = """
+PRAGMAS = """
+PRAGMA journal_mode = WAL;
+PRAGMA synchronous = NORMAL;
+PRAGMA cache_size = -16000;
+PRAGMA temp_store = MEMORY;
+PRAGMA busy_timeout = 5000;
+"""
+
+# Numbered schema migrations. PRAGMA user_version records how many have been
+# applied; append new ones to the end and never edit a shipped one.
+MIGRATIONS = [
+    # 1: initial schema
+    """
 CREATE TABLE IF NOT EXISTS users (
     id INTEGER PRIMARY KEY,
     github_username TEXT,
@@ -24,23 +47,373 @@ CREATE TABLE IF NOT EXISTS repos (
     repo_full_name TEXT NOT NULL UNIQUE,
     channel_id INTEGER NOT NULL
 );
-"""
+""",
+    # 2: durable GitHub webhook queue
+    """
+CREATE TABLE IF NOT EXISTS webhook_deliveries (
+    delivery_id TEXT PRIMARY KEY,
+    event TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    progress INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    received_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_webhook_deliveries_status
+    ON webhook_deliveries (status, next_attempt_at);
+""",
+    # 3: project lookups by channel, student and status
+    """
+CREATE INDEX IF NOT EXISTS idx_projects_channel ON projects (channel_id, id);
+CREATE INDEX IF NOT EXISTS idx_projects_student ON projects (student_id, id);
+CREATE INDEX IF NOT EXISTS idx_projects_status ON projects (status);
+""",
+    # 4: persisted core role IDs per guild
+    """
+CREATE TABLE IF NOT EXISTS core_roles (
+    guild_id INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    role_id INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, key)
+);
+""",
+    # 5: small key/value store for bot bookkeeping
+    """
+CREATE TABLE IF NOT EXISTS bot_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+""",
+    # 6: stable link from a student to their category
+    """
+ALTER TABLE users ADD COLUMN category_id INTEGER;
+CREATE INDEX IF NOT EXISTS idx_users_category ON users (category_id)
+    WHERE category_id IS NOT NULL;
+""",
+    # 7: per-member outcome of /cohort_onboard runs, for resume
+    """
+CREATE TABLE IF NOT EXISTS cohort_members (
+    run_id INTEGER NOT NULL,
+    member_id INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    PRIMARY KEY (run_id, member_id)
+);
+""",
+    # 8: per-repo GitHub event filter; NULL means the default set
+    """
+ALTER TABLE repos ADD COLUMN events TEXT;
+""",
+    # 9: pinned project dashboard messages, one per status section
+    """
+CREATE TABLE IF NOT EXISTS project_boards (
+    channel_id INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    message_id INTEGER NOT NULL,
+    PRIMARY KEY (channel_id, status)
+);
+""",
+    # 10: review queue ordering and status history for review latency
+    """
+CREATE INDEX IF NOT EXISTS idx_projects_status_updated ON projects (status, updated_at, id);
+DROP INDEX IF EXISTS idx_projects_status;
+CREATE TABLE IF NOT EXISTS project_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    project_id INTEGER NOT NULL,
+    from_status TEXT,
+    to_status TEXT NOT NULL,
+    actor_id INTEGER,
+    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_project_events_project ON project_events (project_id, id);
+""",
+    # 11: several communities per bot process
+    """
+CREATE TABLE IF NOT EXISTS guild_config (
+    guild_id INTEGER PRIMARY KEY,
+    enabled INTEGER NOT NULL DEFAULT 1,
+    review_sla_hours REAL,
+    added_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+ALTER TABLE projects ADD COLUMN guild_id INTEGER;
+DROP INDEX IF EXISTS idx_projects_status_updated;
+CREATE INDEX IF NOT EXISTS idx_projects_guild_status_updated
+    ON projects (guild_id, status, updated_at, id);
+""",
+    # 12: commit history and daily per-student/repo/author counts
+    """
+CREATE TABLE IF NOT EXISTS commit_events (
+    repo_full_name TEXT NOT NULL,
+    sha TEXT NOT NULL,
+    guild_id INTEGER,
+    student_id INTEGER,
+    author TEXT,
+    day TEXT NOT NULL,
+    message TEXT,
+    PRIMARY KEY (repo_full_name, sha)
+);
+CREATE TABLE IF NOT EXISTS commit_rollups (
+    guild_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    day TEXT NOT NULL,
+    key TEXT NOT NULL,
+    commits INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, kind, day, key)
+) WITHOUT ROWID;
+""",
+    # 13: last activity per student, driving the Inactive role
+    """
+CREATE TABLE IF NOT EXISTS student_activity (
+    guild_id INTEGER NOT NULL,
+    student_id INTEGER NOT NULL,
+    last_seen REAL NOT NULL,
+    inactive INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, student_id)
+);
+CREATE INDEX IF NOT EXISTS idx_student_activity_state
+    ON student_activity (guild_id, inactive, last_seen);
+""",
+    # 14: full-text search over review feedback and commit messages
+    """
+CREATE TABLE IF NOT EXISTS project_feedback (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    project_id INTEGER NOT NULL,
+    guild_id INTEGER,
+    student_id INTEGER NOT NULL,
+    author_id INTEGER,
+    body TEXT NOT NULL,
+    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_repos_channel ON repos (channel_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS feedback_fts USING fts5(
+    body, content='project_feedback', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS project_feedback_ai AFTER INSERT ON project_feedback BEGIN
+    INSERT INTO feedback_fts (rowid, body) VALUES (new.id, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS project_feedback_ad AFTER DELETE ON project_feedback BEGIN
+    INSERT INTO feedback_fts (feedback_fts, rowid, body) VALUES ('delete', old.id, old.body);
+END;
+CREATE TRIGGER IF NOT EXISTS project_feedback_au AFTER UPDATE OF body ON project_feedback BEGIN
+    INSERT INTO feedback_fts (feedback_fts, rowid, body) VALUES ('delete', old.id, old.body);
+    INSERT INTO feedback_fts (rowid, body) VALUES (new.id, new.body);
+END;
+-- commit_events is insert-only and its rowids can change on VACUUM (no INTEGER PRIMARY KEY),
+-- so the index keeps its own copy and joins back on (repo_full_name, sha)
+CREATE VIRTUAL TABLE IF NOT EXISTS commit_fts USING fts5(
+    message, repo_full_name UNINDEXED, sha UNINDEXED, tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS commit_events_ai AFTER INSERT ON commit_events
+WHEN new.message IS NOT NULL BEGIN
+    INSERT INTO commit_fts (message, repo_full_name, sha)
+    VALUES (new.message, new.repo_full_name, new.sha);
+END;
+INSERT INTO commit_fts (message, repo_full_name, sha)
+SELECT message, repo_full_name, sha FROM commit_events WHERE message IS NOT NULL;
+""",
+]
+
+DB_QUERY_SECONDS = Histogram(
+    "devforge_db_query_seconds",
+    "SQLite statement execution time.",
+    buckets=FAST_BUCKETS,
+    label="statement",
+)
+
+
+@lru_cache(maxsize=512)
+def _statement_label(sql: str) -> str:
+    return " ".join(sql.split())[:120]
+
+
+class _TimedConnection:
+    # Only installed when metrics are enabled, so the disabled path is a bare connection
+    def __init__(self, conn: aiosqlite.Connection):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
 
+    async def execute(self, sql: str, parameters=None):
+        start = time.perf_counter()
+        try:
+            return await self._conn.execute(sql, parameters)
+        finally:
+            DB_QUERY_SECONDS.observe(_statement_label(sql), time.perf_counter() - start)
+
+    async def executemany(self, sql: str, parameters):
+        start = time.perf_counter()
+        try:
+            return await self._conn.executemany(sql, parameters)
+        finally:
+            DB_QUERY_SECONDS.observe(_statement_label(sql), time.perf_counter() - start)
+
+
+# One writer connection (all writes go through transaction()) plus a small
+# pool of read-only connections. With WAL, readers never wait on the writer.
 _db = None
+_readers: asyncio.Queue | None = None
+_reader_conns: list[aiosqlite.Connection] = []
+_write_lock: asyncio.Lock | None = None
+# Set by close_db(); late writers during shutdown must not reopen the pool
+_closed = False
+
+
+async def _connect(query_only: bool = False) -> aiosqlite.Connection:
+    # Autocommit mode: transactions are opened explicitly by transaction()
+    conn = await aiosqlite.connect(DB_PATH, isolation_level=None)
+    await conn.executescript(PRAGMAS)
+    if query_only:
+        await conn.execute("PRAGMA query_only = ON")
+    return _TimedConnection(conn) if METRICS_ENABLED else conn
+
+
+async def migrate(db: aiosqlite.Connection):
+    cur = await db.execute("PRAGMA user_version")
+    (version,) = await cur.fetchone()
+    for number, script in enumerate(MIGRATIONS[version:], version + 1):
+        try:
+            await db.executescript(
+                f"BEGIN IMMEDIATE;\n{script}\nPRAGMA user_version = {number};\nCOMMIT;"
+            )
+        except Exception:
+            if db.in_transaction:
+                await db.execute("ROLLBACK")
+            raise
+        print(f"[INFO] Applied DB migration {number}")
+
 
 async def get_db():
-    global _db
+    global _db, _readers, _write_lock, _closed
+    _closed = False
     if _db is None:
-        _db = await aiosqlite.connect(DB_PATH)
-        await _db.executescript(SCHEMA)
-        await _db.commit()
+        _write_lock = asyncio.Lock()
+        _db = await _connect()
+        await migrate(_db)
+
+        _readers = asyncio.Queue()
+        for _ in range(DB_READERS):
+            conn = await _connect(query_only=True)
+            _reader_conns.append(conn)
+            _readers.put_nowait(conn)
     return _db
 
+
+async def _open_db():
+    if _closed:
+        raise RuntimeError("database is closed")
+    return await get_db()
+
+
+@asynccontextmanager
+async def read_db():
+    await _open_db()
+    conn = await _readers.get()
+    try:
+        yield conn
+    finally:
+        _readers.put_nowait(conn)
+
+
+@asynccontextmanager
+async def transaction():
+    db = await _open_db()
+    async with _write_lock:
+        await db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            await db.execute("ROLLBACK")
+            raise
+        else:
+            await db.execute("COMMIT")
+
+
+async def get_state(key: str) -> str | None:
+    async with read_db() as db:
+        cur = await db.execute("SELECT value FROM bot_state WHERE key = ?", (key,))
+        row = await cur.fetchone()
+    return row[0] if row else None
+
+
+async def set_state(key: str, value: str):
+    async with transaction() as db:
+        await db.execute(
+            "INSERT OR REPLACE INTO bot_state (key, value) VALUES (?, ?)",
+            (key, value),
+        )
+
+
 async def close_db():
-    global _db
+    global _db, _readers, _closed
+    _closed = True
     if _db is not None:
+        for conn in _reader_conns:
+            await conn.close()
+        _reader_conns.clear()
+        _readers = None
         await _db.close()
         _db = None
 
+def _sql_literals(path: str):
+    # Every string literal passed straight to .execute()/.executemany()
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    for node in ast.walk(tree):
+        if (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Attribute)
+            and node.func.attr in ("execute", "executemany")
+            and node.args
+            and isinstance(node.args[0], ast.Constant)
+            and isinstance(node.args[0].value, str)
+        ):
+            yield node.lineno, node.args[0].value
+
+
+def explain_queries(paths: list[str] | None = None) -> int:
+    if paths is None:
+        root = os.path.dirname(os.path.abspath(__file__))
+        paths = sorted(glob.glob(os.path.join(root, "*.py")))
+        paths += sorted(glob.glob(os.path.join(root, "cogs", "*.py")))
+
+    conn = sqlite3.connect(":memory:")
+    for script in MIGRATIONS:
+        conn.executescript(script)
+
+    scans = 0
+    for path in paths:
+        for lineno, sql in sorted(_sql_literals(path)):
+            statement = " ".join(sql.split())
+            if statement.upper().startswith(("PRAGMA", "BEGIN", "COMMIT", "ROLLBACK")):
+                continue
+            plan = conn.execute(
+                f"EXPLAIN QUERY PLAN {sql}", (None,) * sql.count("?")
+            ).fetchall()
+            print(f"{os.path.relpath(path)}:{lineno}: {statement}")
+            for row in plan:
+                detail = row[-1]
+                # A full table scan is only expected for unfiltered bulk loads
+                # FTS5 MATCH shows up as a virtual table scan with a constraint (e.g. "0:M1")
+                flagged = (
+                    detail.startswith("SCAN")
+                    and " USING " not in detail
+                    and not re.search(r"VIRTUAL TABLE INDEX \d+:\S", detail)
+                    and "WHERE" in statement.upper()
+                )
+                scans += flagged
+                print(f"    {'[WARN] ' if flagged else ''}{detail}")
+    conn.close()
+    return scans
+
+
+async def _init():
+    await get_db()
+    await close_db()
+
 if __name__ == "__main__":
-    asyncio.run(get_db())
+    if sys.argv[1:] == ["explain"]:
+        sys.exit(1 if explain_queries() else 0)
+    asyncio.run(_init())
@@ -0,0 +1,116 @@
+import asyncio
+import traceback
+from typing import Awaitable
+import discord
+from metrics import Counter, Histogram
+from outbound import Outbound, Priority
+
+DEADLINE_WARN_SECONDS = 2.0
+
+COMMAND_ERRORS = Counter(
+    "devforge_command_errors_total",
+    "Commands whose background work raised an unexpected error.",
+    label="command",
+)
+
+
+class CommandFailed(Exception):
+    # Raised by command work with a message that is safe to show the user
+    pass
+
+
+def command_name(interaction: discord.Interaction) -> str:
+    command = interaction.command
+    return command.qualified_name if command else "unknown"
+
+
+def since_created(interaction: discord.Interaction) -> float:
+    return (discord.utils.utcnow() - interaction.created_at).total_seconds()
+
+
+class CommandRunner:
+    def __init__(self, outbound: Outbound):
+        self.outbound = outbound
+        self.tasks: set[asyncio.Task] = set()
+        self.response_latency = Histogram(
+            "devforge_command_response_seconds",
+            "Time from interaction creation to the first response.",
+        )
+        self.total_latency = Histogram(
+            "devforge_command_total_seconds",
+            "Time from interaction creation until all command work finished.",
+        )
+
+    def observe_response(self, interaction: discord.Interaction, name: str | None = None):
+        if interaction.extras.get("response_observed"):
+            return
+        interaction.extras["response_observed"] = True
+        name = name or command_name(interaction)
+        elapsed = since_created(interaction)
+        self.response_latency.observe(name, elapsed)
+        if elapsed > DEADLINE_WARN_SECONDS:
+            print(f"[WARN] /{name} responded after {elapsed:.2f}s")
+
+    def observe_total(self, interaction: discord.Interaction, name: str | None = None):
+        self.total_latency.observe(name or command_name(interaction), since_created(interaction))
+
+    async def defer(self, interaction: discord.Interaction, *, ephemeral: bool = True):
+        await interaction.response.defer(ephemeral=ephemeral, thinking=True)
+        self.observe_response(interaction)
+
+    def spawn(
+        self,
+        interaction: discord.Interaction,
+        work: Awaitable[str | None],
+        *,
+        ephemeral: bool = True,
+        name: str | None = None,
+    ) -> asyncio.Task:
+        interaction.extras["background"] = True
+        task = asyncio.create_task(self._run(interaction, work, ephemeral, name))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def run_deferred(
+        self,
+        interaction: discord.Interaction,
+        work: Awaitable[str | None],
+        *,
+        ephemeral: bool = True,
+    ) -> asyncio.Task:
+        await self.defer(interaction, ephemeral=ephemeral)
+        return self.spawn(interaction, work, ephemeral=ephemeral)
+
+    async def _run(
+        self,
+        interaction: discord.Interaction,
+        work: Awaitable[str | None],
+        ephemeral: bool,
+        name: str | None,
+    ):
+        name = name or command_name(interaction)
+        try:
+            result = await work
+        except CommandFailed as e:
+            result = str(e)
+        except Exception:
+            COMMAND_ERRORS.inc(name)
+            print(f"[ERROR] /{name} failed:\n{traceback.format_exc()}")
+            result = "Нещо се обърка. Администраторите са уведомени в логовете."
+        finally:
+            self.observe_total(interaction, name)
+
+        if result:
+            try:
+                await self.outbound.run(
+                    Priority.INTERACTION,
+                    ("interaction", interaction.id),
+                    lambda: interaction.followup.send(result, ephemeral=ephemeral),
+                )
+            except discord.HTTPException as e:
+                print(f"[WARN] /{name} followup failed: {e}")
+
+    async def drain(self, timeout: float = 10.0):
+        if self.tasks:
+            await asyncio.wait(set(self.tasks), timeout=timeout)
@@ -0,0 +1,81 @@
+import aiosqlite
+from db import read_db
+from project_index import Project
+
+SNIPPET_TOKENS = 16
+
+
+def fts_query(text: str) -> str:
+    # Every word is a quoted prefix term, so user input can't hit FTS5 query syntax
+    terms = [word.replace('"', '""') for word in text.split()]
+    return " ".join(f'"{term}"*' for term in terms if term)
+
+
+async def record_feedback(db: aiosqlite.Connection, project: Project, author_id: int, body: str):
+    # Runs inside the caller's transaction; feedback_fts is kept in sync by triggers
+    await db.execute(
+        """
+        INSERT INTO project_feedback (project_id, guild_id, student_id, author_id, body)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (project.id, project.guild_id, project.student_id, author_id, body),
+    )
+
+
+async def search_feedback(
+    guild_id: int,
+    text: str,
+    student_id: int | None = None,
+    project_id: int | None = None,
+    limit: int = 10,
+) -> list[tuple]:
+    query = fts_query(text)
+    if not query:
+        return []
+    async with read_db() as db:
+        cur = await db.execute(
+            """
+            SELECT pf.project_id, pf.student_id, pf.author_id, pf.created_at,
+                   snippet(feedback_fts, 0, '**', '**', '…', ?)
+            FROM feedback_fts
+            JOIN project_feedback AS pf ON pf.id = feedback_fts.rowid
+            WHERE feedback_fts MATCH ? AND pf.guild_id = ?
+              AND (? IS NULL OR pf.student_id = ?)
+              AND (? IS NULL OR pf.project_id = ?)
+            ORDER BY rank
+            LIMIT ?
+            """,
+            (SNIPPET_TOKENS, query, guild_id, student_id, student_id, project_id, project_id, limit),
+        )
+        return await cur.fetchall()
+
+
+async def search_commits(
+    guild_id: int,
+    text: str,
+    student_id: int | None = None,
+    channel_id: int | None = None,
+    limit: int = 10,
+) -> list[tuple]:
+    query = fts_query(text)
+    if not query:
+        return []
+    async with read_db() as db:
+        cur = await db.execute(
+            """
+            SELECT ce.repo_full_name, ce.sha, ce.student_id, ce.day,
+                   snippet(commit_fts, 0, '**', '**', '…', ?)
+            FROM commit_fts
+            JOIN commit_events AS ce
+              ON ce.repo_full_name = commit_fts.repo_full_name AND ce.sha = commit_fts.sha
+            WHERE commit_fts MATCH ? AND ce.guild_id = ?
+              AND (? IS NULL OR ce.student_id = ?)
+              AND (? IS NULL OR ce.repo_full_name IN (
+                  SELECT repo_full_name FROM repos WHERE channel_id = ?
+              ))
+            ORDER BY rank
+            LIMIT ?
+            """,
+            (SNIPPET_TOKENS, query, guild_id, student_id, student_id, channel_id, channel_id, limit),
+        )
+        return await cur.fetchall()
@@ -0,0 +1,371 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Callable
+import discord
+from outbound import EMBEDS_PER_MESSAGE, MESSAGE_EMBED_CHARS, Outbound, Priority
+
+# Discord message limits for the commit feed
+EMBED_DESCRIPTION_CHARS = 4096
+COMMIT_LINE_CHARS = 1000
+TITLE_CHARS = 256
+REVIEW_BODY_CHARS = 1000
+
+# check_run and other live events: edits per (channel, key) at most once per window
+LIVE_DEBOUNCE_SECONDS = 5.0
+LIVE_MAX_ENTRIES = 500
+
+
+def format_commit(c: dict) -> str:
+    msg = c.get("message", "").strip()
+    url = c.get("url")
+    author = c.get("author", {}).get("username") or c.get("author", {}).get("name")
+    line = f"`{author}` → `{msg}`"
+    if len(line) > COMMIT_LINE_CHARS:
+        line = line[: COMMIT_LINE_CHARS - 2] + "…`"
+    return f"{line}\n<{url}>"
+
+
+def pack_commits(repo_full_name: str, commits: list[dict]) -> list[list[discord.Embed]]:
+    title = f"{repo_full_name}: {len(commits)} commit(s)"
+    messages: list[list[discord.Embed]] = []
+    embeds: list[discord.Embed] = []
+    desc = ""
+    used = len(title)
+
+    def flush_embed():
+        nonlocal desc
+        if desc:
+            embeds.append(
+                discord.Embed(
+                    title=title if not messages and not embeds else None,
+                    description=desc,
+                    color=discord.Color.dark_grey(),
+                )
+            )
+            desc = ""
+
+    for c in commits:
+        line = format_commit(c)
+        sep = "\n" if desc else ""
+        if len(desc) + len(sep) + len(line) > EMBED_DESCRIPTION_CHARS:
+            flush_embed()
+            sep = ""
+        if used + len(sep) + len(line) > MESSAGE_EMBED_CHARS or len(embeds) >= EMBEDS_PER_MESSAGE:
+            flush_embed()
+            messages.append(embeds)
+            embeds = []
+            used = 0
+            sep = ""
+        desc += sep + line
+        used += len(sep) + len(line)
+
+    flush_embed()
+    if embeds:
+        messages.append(embeds)
+    return messages
+
+
+def repo_of(data: dict) -> dict:
+    return {"full_name": data["repository"]["full_name"]}
+
+
+def login_of(user: dict | None) -> str | None:
+    return (user or {}).get("login")
+
+
+def extract_push(data: dict) -> dict | None:
+    # Only what the commit feed and activity rollups use is queued; the rest is dropped
+    commits = []
+    for c in data.get("commits") or []:
+        author = c.get("author") or {}
+        commits.append(
+            {
+                "id": c.get("id"),
+                "timestamp": c.get("timestamp"),
+                "message": (c.get("message") or "")[:COMMIT_LINE_CHARS],
+                "url": c.get("url"),
+                "author": {"name": author.get("name"), "username": author.get("username")},
+            }
+        )
+    if not commits:
+        # Branch deletions and tag pushes carry no commits
+        return None
+    return {"repository": repo_of(data), "commits": commits}
+
+
+def render_push(data: dict) -> list[list[discord.Embed]]:
+    return pack_commits(data["repository"]["full_name"], data.get("commits", []))
+
+
+PR_ACTIONS = {"opened", "reopened", "closed", "ready_for_review"}
+
+
+def extract_pull_request(data: dict) -> dict | None:
+    if data.get("action") not in PR_ACTIONS:
+        return None
+    pr = data["pull_request"]
+    return {
+        "repository": repo_of(data),
+        "action": data["action"],
+        "number": pr["number"],
+        "title": (pr.get("title") or "")[:TITLE_CHARS],
+        "url": pr.get("html_url"),
+        "user": login_of(pr.get("user")),
+        "merged": bool(pr.get("merged")),
+    }
+
+
+def render_pull_request(data: dict) -> list[list[discord.Embed]]:
+    if data["action"] == "closed":
+        summary, color = ("✅ Merged", discord.Color.green()) if data["merged"] else (
+            "❌ Затворен без merge",
+            discord.Color.red(),
+        )
+    else:
+        summary = {
+            "opened": "🆕 Нов pull request",
+            "reopened": "🔁 Отворен отново",
+            "ready_for_review": "👀 Готов за ревю",
+        }[data["action"]]
+        color = discord.Color.blurple()
+    embed = discord.Embed(
+        title=f"{data['repository']['full_name']}#{data['number']}: {data['title']}"[:TITLE_CHARS],
+        url=data["url"],
+        description=f"{summary} · `{data['user']}`",
+        color=color,
+    )
+    return [[embed]]
+
+
+REVIEW_STATES = {
+    "approved": ("✅ Одобрен", discord.Color.green()),
+    "changes_requested": ("✏️ Поискани промени", discord.Color.orange()),
+    "commented": ("💬 Коментар", discord.Color.light_grey()),
+}
+
+
+def extract_pull_request_review(data: dict) -> dict | None:
+    review = data["review"]
+    state = (review.get("state") or "").lower()
+    if data.get("action") != "submitted" or state not in REVIEW_STATES:
+        return None
+    pr = data["pull_request"]
+    return {
+        "repository": repo_of(data),
+        "number": pr["number"],
+        "title": (pr.get("title") or "")[:TITLE_CHARS],
+        "url": review.get("html_url"),
+        "reviewer": login_of(review.get("user")),
+        "state": state,
+        "body": (review.get("body") or "")[:REVIEW_BODY_CHARS],
+    }
+
+
+def render_pull_request_review(data: dict) -> list[list[discord.Embed]]:
+    summary, color = REVIEW_STATES[data["state"]]
+    description = f"{summary} от `{data['reviewer']}`"
+    if data["body"]:
+        description += f"\n\n{data['body']}"
+    embed = discord.Embed(
+        title=f"{data['repository']['full_name']}#{data['number']}: {data['title']}"[:TITLE_CHARS],
+        url=data["url"],
+        description=description,
+        color=color,
+    )
+    return [[embed]]
+
+
+def extract_check_run(data: dict) -> dict | None:
+    check = data["check_run"]
+    return {
+        "repository": repo_of(data),
+        "sha": check["head_sha"],
+        "name": (check.get("name") or "check")[:TITLE_CHARS],
+        "status": check.get("status"),
+        "conclusion": check.get("conclusion"),
+        "url": check.get("html_url"),
+    }
+
+
+def merge_check_run(state: dict | None, data: dict) -> dict:
+    if state is None:
+        state = {"repository": data["repository"], "sha": data["sha"], "checks": {}}
+    state["checks"][data["name"]] = {
+        "status": data["status"],
+        "conclusion": data["conclusion"],
+        "url": data["url"],
+    }
+    return state
+
+
+CHECK_ICONS = {
+    "success": "✅",
+    "failure": "❌",
+    "timed_out": "❌",
+    "action_required": "⚠️",
+    "cancelled": "⚪",
+    "skipped": "⚪",
+    "neutral": "⚪",
+    "stale": "⚪",
+}
+
+
+def render_check_run(state: dict) -> list[list[discord.Embed]]:
+    checks = state["checks"]
+    lines = []
+    for name, check in sorted(checks.items()):
+        if check["status"] == "completed":
+            icon = CHECK_ICONS.get(check["conclusion"], "⚪")
+        else:
+            icon = "⏳"
+        lines.append(f"{icon} [{name}]({check['url']})" if check["url"] else f"{icon} {name}")
+
+    conclusions = [c["conclusion"] for c in checks.values()]
+    if any(c in ("failure", "timed_out") for c in conclusions):
+        color = discord.Color.red()
+    elif all(c["status"] == "completed" for c in checks.values()):
+        color = discord.Color.green()
+    else:
+        color = discord.Color.gold()
+
+    description = ""
+    for i, line in enumerate(lines):
+        more = f"\n… и още {len(lines) - i}"
+        if len(description) + len(line) + 1 + len(more) > EMBED_DESCRIPTION_CHARS:
+            description += more
+            break
+        description += ("\n" if description else "") + line
+    embed = discord.Embed(
+        title=f"{state['repository']['full_name']} @ {state['sha'][:7]}: CI",
+        description=description,
+        color=color,
+    )
+    return [[embed]]
+
+
+def extract_release(data: dict) -> dict | None:
+    if data.get("action") != "published":
+        return None
+    release = data["release"]
+    return {
+        "repository": repo_of(data),
+        "tag": release.get("tag_name"),
+        "name": (release.get("name") or "")[:TITLE_CHARS],
+        "url": release.get("html_url"),
+        "author": login_of(release.get("author")),
+        "prerelease": bool(release.get("prerelease")),
+    }
+
+
+def render_release(data: dict) -> list[list[discord.Embed]]:
+    kind = "Pre-release" if data["prerelease"] else "Release"
+    embed = discord.Embed(
+        title=f"🚀 {data['repository']['full_name']} {data['tag']}"[:TITLE_CHARS],
+        url=data["url"],
+        description=f"{kind} `{data['name'] or data['tag']}` от `{data['author']}`",
+        color=discord.Color.purple(),
+    )
+    return [[embed]]
+
+
+@dataclass(frozen=True, slots=True)
+class EventHandler:
+    # Keeps only the fields render needs; None means the delivery is not worth posting
+    extract: Callable[[dict], dict | None]
+    render: Callable[[dict], list[list[discord.Embed]]]
+    # Live events are folded per key into one message that is edited in place
+    key: Callable[[dict], str] | None = None
+    merge: Callable[[dict | None, dict], dict] | None = None
+
+
+EVENT_HANDLERS: dict[str, EventHandler] = {}
+
+
+def register_event(event: str, handler: EventHandler):
+    EVENT_HANDLERS[event] = handler
+
+
+register_event("push", EventHandler(extract_push, render_push))
+register_event("pull_request", EventHandler(extract_pull_request, render_pull_request))
+register_event(
+    "pull_request_review",
+    EventHandler(extract_pull_request_review, render_pull_request_review),
+)
+register_event(
+    "check_run",
+    EventHandler(
+        extract_check_run,
+        render_check_run,
+        key=lambda data: f"{data['repository']['full_name']}@{data['sha']}",
+        merge=merge_check_run,
+    ),
+)
+register_event("release", EventHandler(extract_release, render_release))
+
+
+class LiveMessages:
+    def __init__(self, outbound: Outbound, debounce_seconds: float = LIVE_DEBOUNCE_SECONDS):
+        self.outbound = outbound
+        self.debounce_seconds = debounce_seconds
+        # (channel_id, key) -> merged state / posted message id, oldest first
+        self.states: dict[tuple[int, str], dict] = {}
+        self.message_ids: dict[tuple[int, str], int] = {}
+        self.flushes: dict[tuple[int, str], asyncio.Task] = {}
+
+    def update(
+        self,
+        channel: discord.TextChannel,
+        handler: EventHandler,
+        data: dict,
+        lock: asyncio.Lock,
+    ):
+        key = (channel.id, handler.key(data))
+        state = handler.merge(self.states.pop(key, None), data)
+        self.states[key] = state
+        self.evict()
+
+        # Status changes that land inside the window share one edit
+        if key not in self.flushes:
+            self.flushes[key] = asyncio.create_task(self.flush_later(channel, handler, key, lock))
+
+    def evict(self):
+        for key in list(self.states)[: max(0, len(self.states) - LIVE_MAX_ENTRIES)]:
+            if key not in self.flushes:
+                del self.states[key]
+                self.message_ids.pop(key, None)
+
+    async def flush_later(
+        self,
+        channel: discord.TextChannel,
+        handler: EventHandler,
+        key: tuple[int, str],
+        lock: asyncio.Lock,
+    ):
+        await asyncio.sleep(self.debounce_seconds)
+        del self.flushes[key]
+        state = self.states.get(key)
+        if state is None:
+            return
+        embeds = handler.render(state)[0]
+        async with lock:
+            message_id = self.message_ids.get(key)
+            try:
+                if message_id:
+                    try:
+                        await self.outbound.run(
+                            Priority.FEED,
+                            ("channel", channel.id),
+                            lambda: channel.get_partial_message(message_id).edit(embeds=embeds),
+                        )
+                        return
+                    except discord.NotFound:
+                        pass
+                message = await self.outbound.send(channel, Priority.FEED, embeds=embeds)
+                self.message_ids[key] = message.id
+            except discord.HTTPException as e:
+                print(f"[WARN] live update for {key[1]} failed: {e}")
+
+    def cancel(self):
+        for task in self.flushes.values():
+            task.cancel()
+        self.flushes.clear()
@@ -0,0 +1,68 @@
+import os
+from dataclasses import dataclass, field
+from db import read_db, transaction
+
+DEFAULT_REVIEW_SLA_HOURS = float(os.getenv("REVIEW_SLA_HOURS", "48"))
+
+
+def env_guild_ids() -> list[int]:
+    # GUILD_IDS is a comma-separated list; GUILD_ID is kept for single-guild setups
+    raw = os.getenv("GUILD_IDS") or os.getenv("GUILD_ID", "")
+    return [int(part) for part in raw.split(",") if part.strip() and int(part) != 0]
+
+
+@dataclass(slots=True)
+class GuildConfig:
+    guild_id: int
+    review_sla_hours: float = DEFAULT_REVIEW_SLA_HOURS
+    # core role key -> role id, mirrored from core_roles
+    roles: dict[str, int] = field(default_factory=dict)
+
+
+class GuildConfigs:
+    def __init__(self):
+        self._configs: dict[int, GuildConfig] = {}
+
+    async def load(self, seed_ids: list[int]):
+        async with transaction() as db:
+            await db.executemany(
+                "INSERT OR IGNORE INTO guild_config (guild_id) VALUES (?)",
+                [(guild_id,) for guild_id in seed_ids],
+            )
+            if seed_ids:
+                # Projects created before multi-guild support belong to the first guild
+                await db.execute(
+                    "UPDATE projects SET guild_id = ? WHERE guild_id IS NULL",
+                    (seed_ids[0],),
+                )
+
+        async with read_db() as db:
+            cur = await db.execute("SELECT guild_id, enabled, review_sla_hours FROM guild_config")
+            configs = {
+                guild_id: GuildConfig(guild_id, sla if sla is not None else DEFAULT_REVIEW_SLA_HOURS)
+                for guild_id, enabled, sla in await cur.fetchall()
+                if enabled
+            }
+            cur = await db.execute("SELECT guild_id, key, role_id FROM core_roles")
+            for guild_id, key, role_id in await cur.fetchall():
+                if guild_id in configs:
+                    configs[guild_id].roles[key] = role_id
+        self._configs = configs
+
+    def get(self, guild_id: int | None) -> GuildConfig | None:
+        return self._configs.get(guild_id)
+
+    def all(self) -> list[GuildConfig]:
+        return list(self._configs.values())
+
+    def __contains__(self, guild_id: int) -> bool:
+        return guild_id in self._configs
+
+    def roles(self, guild_id: int | None) -> dict[str, int]:
+        config = self._configs.get(guild_id)
+        return config.roles if config else {}
+
+    def set_roles(self, guild_id: int, roles: dict[str, int]):
+        config = self._configs.get(guild_id)
+        if config is not None:
+            config.roles = dict(roles)
@@ -0,0 +1,98 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict
+import discord
+from guild_config import GuildConfigs
+
+# Core role keys whose holders stay in the resolver's LRU; empty keeps every resolved member
+MEMBER_CACHE_ROLES = tuple(
+    key.strip()
+    for key in os.getenv("MEMBER_CACHE_ROLES", "student,mentor,admin").split(",")
+    if key.strip()
+)
+MEMBER_CACHE_SIZE = int(os.getenv("MEMBER_CACHE_SIZE", "2000"))
+# Members outside the library cache get no gateway updates, so entries expire
+MEMBER_CACHE_TTL_SECONDS = 600.0
+MEMBER_QUERY_LIMIT = 5
+
+
+def member_cache_flags() -> discord.MemberCacheFlags:
+    # discord.py keeps only the bot's own member; everything else goes through MemberResolver
+    return discord.MemberCacheFlags.none()
+
+
+class MemberResolver:
+    def __init__(
+        self,
+        guild_configs: GuildConfigs,
+        size: int = MEMBER_CACHE_SIZE,
+        keep_roles: tuple[str, ...] = MEMBER_CACHE_ROLES,
+    ):
+        self.guild_configs = guild_configs
+        self.size = size
+        self.keep_roles = keep_roles
+        # (guild_id, member_id) -> (stored at, member), least recently used first
+        self._members: OrderedDict[tuple[int, int], tuple[float, discord.Member]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def keeps(self, member: discord.Member) -> bool:
+        if not self.keep_roles:
+            return True
+        roles = self.guild_configs.roles(member.guild.id)
+        return any(member.get_role(roles[key]) for key in self.keep_roles if key in roles)
+
+    def remember(self, member: discord.Member):
+        key = (member.guild.id, member.id)
+        if not self.keeps(member):
+            self._members.pop(key, None)
+            return
+        self._members[key] = (time.monotonic(), member)
+        self._members.move_to_end(key)
+        while len(self._members) > self.size:
+            self._members.popitem(last=False)
+
+    def forget(self, guild_id: int, member_id: int):
+        self._members.pop((guild_id, member_id), None)
+
+    def cached(self, guild: discord.Guild, member_id: int) -> discord.Member | None:
+        member = guild.get_member(member_id)
+        if member is not None:
+            return member
+        key = (guild.id, member_id)
+        entry = self._members.get(key)
+        if entry is None:
+            return None
+        stored_at, member = entry
+        if time.monotonic() - stored_at > MEMBER_CACHE_TTL_SECONDS:
+            del self._members[key]
+            return None
+        self._members.move_to_end(key)
+        return member
+
+    async def resolve(self, guild: discord.Guild, member_id: int) -> discord.Member | None:
+        # None means the member isn't in the guild; other API errors are raised
+        member = self.cached(guild, member_id)
+        if member is not None:
+            return member
+        try:
+            member = await guild.fetch_member(member_id)
+        except discord.NotFound:
+            return None
+        self.remember(member)
+        return member
+
+    async def resolve_named(self, guild: discord.Guild, name: str) -> discord.Member | None:
+        # Without a full member list, names are looked up over the gateway
+        try:
+            found = await guild.query_members(query=name, limit=MEMBER_QUERY_LIMIT, cache=False)
+        except (asyncio.TimeoutError, discord.ClientException) as e:
+            print(f"[WARN] member query for {name!r} in guild {guild.id} failed: {e!r}")
+            return None
+        for member in found:
+            if name in (member.name, member.global_name, member.nick):
+                self.remember(member)
+                return member
+        return None
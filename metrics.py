@@ -0,0 +1,194 @@
+import os
+import math
+import time
+import asyncio
+import logging
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+
+# Seconds; 3.0 is Discord's interaction response deadline
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 2.5, 3.0, 5.0, 10.0, 30.0, math.inf)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, math.inf)
+
+# name -> metric; re-creating a metric (e.g. on extension reload) replaces it
+_registry: dict[str, "Counter | Gauge | Histogram"] = {}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, label: str = "kind"):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.values: dict[str, float] = {}
+        _registry[name] = self
+
+    def inc(self, label: str = "", amount: float = 1):
+        if not METRICS_ENABLED:
+            return
+        self.values[label] = self.values.get(label, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label, value in self.values.items():
+            lines.append(f'{self.name}{{{self.label}="{_escape(label)}"}} {_format(value)}')
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help: str, read=None):
+        self.name = name
+        self.help = help
+        self.value = 0.0
+        # Optional callback evaluated at scrape time instead of on every change
+        self.read = read
+        _registry[name] = self
+
+    def set(self, value: float):
+        self.value = value
+
+    def render(self) -> list[str]:
+        value = self.read() if self.read else self.value
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            return []
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {_format(float(value))}",
+        ]
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+        label: str = "command",
+    ):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.label = label
+        # label value -> (per-bucket counts, sum, count)
+        self.series: dict[str, list] = {}
+        _registry[name] = self
+
+    def observe(self, label: str, value: float):
+        if not METRICS_ENABLED:
+            return
+        series = self.series.get(label)
+        if series is None:
+            series = self.series[label] = [[0] * len(self.buckets), 0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][i] += 1
+                break
+        series[1] += value
+        series[2] += 1
+
+    def quantile(self, label: str, q: float) -> float:
+        # Upper bound of the bucket that holds the q-th observation
+        series = self.series.get(label)
+        if not series or not series[2]:
+            return 0.0
+        rank = q * series[2]
+        seen = 0
+        for bound, n in zip(self.buckets, series[0]):
+            seen += n
+            if seen >= rank:
+                return bound
+        return math.inf
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label, (counts, total, count) in self.series.items():
+            label = f'{self.label}="{_escape(label)}"'
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{label},le="{_format(bound)}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {_format(total)}")
+            lines.append(f"{self.name}_count{{{label}}} {count}")
+        return lines
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry.values():
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+LOOP_LAG = Gauge("devforge_event_loop_lag_seconds", "How late the last event-loop tick fired.")
+
+
+async def watch_loop_lag(interval: float = 0.5):
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        LOOP_LAG.set(max(0.0, loop.time() - start - interval))
+
+
+DISCORD_REST_SECONDS = Histogram(
+    "devforge_discord_rest_seconds",
+    "Discord REST call duration, including rate-limit waits.",
+    label="route",
+)
+DISCORD_RATE_LIMITS = Counter(
+    "devforge_discord_rate_limits_total",
+    "429 responses from Discord, by scope.",
+    label="scope",
+)
+
+
+class _RateLimitLogHandler(logging.Handler):
+    # discord.py retries 429s internally and only reports them through logging
+    def __init__(self, level: int = logging.NOTSET):
+        super().__init__(level)
+        self.pending_route = 0
+
+    def emit(self, record: logging.LogRecord):
+        if not isinstance(record.msg, str):
+            return
+        # Every 429 logs the route line; a global one logs its own line right after,
+        # before yielding, so route hits are only counted once that had its chance
+        if record.msg.startswith("We are being rate limited"):
+            if not self.pending_route:
+                asyncio.get_running_loop().call_soon(self._count_route)
+            self.pending_route += 1
+        elif record.msg.startswith("Global rate limit"):
+            self.pending_route = max(0, self.pending_route - 1)
+            DISCORD_RATE_LIMITS.inc("global")
+
+    def _count_route(self):
+        if self.pending_route:
+            DISCORD_RATE_LIMITS.inc("route", self.pending_route)
+        self.pending_route = 0
+
+
+def instrument_http(http):
+    original = http.request
+
+    async def request(route, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await original(route, **kwargs)
+        finally:
+            DISCORD_REST_SECONDS.observe(
+                f"{route.method} {route.path}", time.perf_counter() - start
+            )
+
+    http.request = request
+    handler = _RateLimitLogHandler(level=logging.WARNING)
+    logging.getLogger("discord.http").addHandler(handler)
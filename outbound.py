@@ -0,0 +1,331 @@
+import os
+import time
+import heapq
+import asyncio
+import itertools
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Awaitable, Callable
+import discord
+from metrics import Counter, Histogram
+
+# Discord message limits, shared with the commit feed renderer
+MESSAGE_CHARS = 2000
+EMBEDS_PER_MESSAGE = 10
+MESSAGE_EMBED_CHARS = 6000
+
+OUTBOUND_WORKERS = int(os.getenv("OUTBOUND_WORKERS", "8"))
+# Pace for dashboard and feed calls: under Discord's global 50 requests/s, so commands
+# and moderation always have budget left
+OUTBOUND_RATE_PER_SECOND = float(os.getenv("OUTBOUND_RATE_PER_SECOND", "40"))
+# Workers that dashboard and feed calls can never occupy, so commands always get one
+OUTBOUND_RESERVED_WORKERS = 2
+# Feed submitters wait once this many calls are queued
+OUTBOUND_MAX_QUEUED = int(os.getenv("OUTBOUND_MAX_QUEUED", "500"))
+
+
+class Priority(IntEnum):
+    INTERACTION = 0
+    MODERATION = 1
+    DASHBOARD = 2
+    FEED = 3
+
+
+OUTBOUND_WAIT = Histogram(
+    "devforge_outbound_wait_seconds",
+    "Time a Discord call spent queued before it ran.",
+    label="priority",
+)
+OUTBOUND_CALLS = Counter(
+    "devforge_outbound_calls_total",
+    "Discord calls made by the outbound dispatcher.",
+    label="priority",
+)
+OUTBOUND_COALESCED = Counter(
+    "devforge_outbound_coalesced_total",
+    "Messages merged into a message already queued for the same channel.",
+    label="priority",
+)
+OUTBOUND_BACKPRESSURE = Counter(
+    "devforge_outbound_backpressure_seconds_total",
+    "Time submitters waited for room in a full outbound queue.",
+    label="priority",
+)
+
+
+class SendFailed(Exception):
+    # send_all stopped at messages[sent]; the ones before it went out
+    def __init__(self, sent: int, error: discord.HTTPException):
+        super().__init__(str(error))
+        self.sent = sent
+        self.error = error
+
+
+def bucket_of(target: discord.abc.Messageable) -> tuple[str, int]:
+    if isinstance(target, (discord.User, discord.Member)):
+        return ("dm", target.id)
+    return ("channel", target.id)
+
+
+def merge_messages(queued: dict, new: dict) -> dict | None:
+    # Only plain content or embed-only messages with identical options are merged
+    rest = {k: v for k, v in queued.items() if k not in ("content", "embeds")}
+    if rest != {k: v for k, v in new.items() if k not in ("content", "embeds")}:
+        return None
+    if "embeds" in queued or "embeds" in new:
+        if "content" in queued or "content" in new:
+            return None
+        embeds = [*queued.get("embeds", ()), *new.get("embeds", ())]
+        if len(embeds) > EMBEDS_PER_MESSAGE or sum(map(len, embeds)) > MESSAGE_EMBED_CHARS:
+            return None
+        return {**rest, "embeds": embeds}
+    if "content" not in queued or "content" not in new:
+        return None
+    content = f"{queued['content']}\n{new['content']}"
+    if len(content) > MESSAGE_CHARS:
+        return None
+    return {**rest, "content": content}
+
+
+@dataclass(eq=False)
+class Job:
+    priority: Priority
+    seq: int
+    call: Callable[[], Awaitable[Any]] | None = None
+    # Message sends keep their arguments so later sends can be merged in
+    target: discord.abc.Messageable | None = None
+    kwargs: dict | None = None
+    coalesce: bool = False
+    futures: list[asyncio.Future] = field(default_factory=list)
+    # send_all batches with a message in this job; a failure drops their later messages
+    groups: list[list[asyncio.Future]] = field(default_factory=list)
+    queued_at: float = field(default_factory=time.monotonic)
+
+    def __lt__(self, other: "Job") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class Outbound:
+    def __init__(self, workers: int = OUTBOUND_WORKERS, rate: float = OUTBOUND_RATE_PER_SECOND):
+        self.workers = workers
+        self.background_limit = max(1, workers - OUTBOUND_RESERVED_WORKERS)
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self.next_slot = 0.0
+        # bucket -> queued jobs; a bucket runs one job at a time, so a channel keeps its order
+        self.buckets: dict[tuple, list[Job]] = {}
+        self.busy: set[tuple] = set()
+        # (priority, seq, bucket) of runnable bucket heads; stale entries are skipped
+        self.ready: list[tuple[int, int, tuple]] = []
+        self.queued = 0
+        self.background = 0
+        self.seq = itertools.count()
+        self.wakeup = asyncio.Event()
+        self.room = asyncio.Event()
+        self.room.set()
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.tasks: list[asyncio.Task] = []
+
+    def start(self):
+        if not self.tasks:
+            self.tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def close(self, timeout: float = 10.0):
+        try:
+            await asyncio.wait_for(self.idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            print(f"[WARN] outbound queue closed with {self.queued} call(s) pending")
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        for jobs in self.buckets.values():
+            for job in jobs:
+                for future in job.futures:
+                    future.cancel()
+        self.buckets.clear()
+        self.ready.clear()
+        self.queued = 0
+
+    async def run(
+        self, priority: Priority, bucket: tuple, call: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        await self._wait_for_room(priority)
+        return await self.submit(priority, bucket, call)
+
+    async def send(
+        self,
+        target: discord.abc.Messageable,
+        priority: Priority,
+        *,
+        coalesce: bool = False,
+        **kwargs,
+    ) -> discord.Message:
+        await self._wait_for_room(priority)
+        return await self.submit(
+            priority, bucket_of(target), target=target, kwargs=kwargs, coalesce=coalesce
+        )
+
+    async def send_all(
+        self,
+        target: discord.abc.Messageable,
+        priority: Priority,
+        messages: list[dict],
+        *,
+        coalesce: bool = False,
+    ) -> list[discord.Message]:
+        # Queued back to back, so nothing else sent to the target lands between them,
+        # and queued messages can merge instead of each waiting on the previous send
+        await self._wait_for_room(priority)
+        group: list[asyncio.Future] = []
+        for kwargs in messages:
+            group.append(
+                self.submit(
+                    priority,
+                    bucket_of(target),
+                    target=target,
+                    kwargs=kwargs,
+                    coalesce=coalesce,
+                    group=group,
+                )
+            )
+        results = []
+        try:
+            for future in group:
+                results.append(await future)
+        except discord.HTTPException as e:
+            raise SendFailed(len(results), e) from e
+        finally:
+            for future in group:
+                if not future.done():
+                    future.cancel()
+                elif not future.cancelled():
+                    # Merged sends share one error; mark it retrieved for the rest
+                    future.exception()
+        return results
+
+    def submit(
+        self,
+        priority: Priority,
+        bucket: tuple,
+        call: Callable[[], Awaitable[Any]] | None = None,
+        *,
+        target: discord.abc.Messageable | None = None,
+        kwargs: dict | None = None,
+        coalesce: bool = False,
+        group: list[asyncio.Future] | None = None,
+    ) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        jobs = self.buckets.setdefault(bucket, [])
+
+        if coalesce:
+            # Only the newest queued send of this class, so order within the class holds
+            same_class = [job for job in jobs if job.priority == priority]
+            last = max(same_class, key=lambda job: job.seq, default=None)
+            if last is not None and last.coalesce:
+                merged = merge_messages(last.kwargs, kwargs)
+                if merged is not None:
+                    last.kwargs = merged
+                    last.futures.append(future)
+                    if group is not None:
+                        last.groups.append(group)
+                    OUTBOUND_COALESCED.inc(priority.name.lower())
+                    return future
+
+        job = Job(priority, next(self.seq), call, target, kwargs, coalesce, [future])
+        if group is not None:
+            job.groups.append(group)
+        heapq.heappush(jobs, job)
+        self.queued += 1
+        self.idle.clear()
+        if self.queued >= OUTBOUND_MAX_QUEUED:
+            self.room.clear()
+        if bucket not in self.busy and jobs[0] is job:
+            heapq.heappush(self.ready, (job.priority, job.seq, bucket))
+            self.wakeup.set()
+        return future
+
+    async def _wait_for_room(self, priority: Priority):
+        # Only the commit feed is held back; everything else is small or user-facing
+        if priority < Priority.FEED or self.room.is_set():
+            return
+        start = time.monotonic()
+        await self.room.wait()
+        OUTBOUND_BACKPRESSURE.inc(priority.name.lower(), time.monotonic() - start)
+
+    def _take(self) -> tuple[tuple, Job] | None:
+        while self.ready:
+            priority, seq, bucket = self.ready[0]
+            jobs = self.buckets.get(bucket)
+            head = jobs[0] if jobs else None
+            if bucket in self.busy or head is None or (head.priority, head.seq) != (priority, seq):
+                heapq.heappop(self.ready)
+                continue
+            if priority >= Priority.DASHBOARD and self.background >= self.background_limit:
+                return None
+            heapq.heappop(self.ready)
+            self.busy.add(bucket)
+            return bucket, heapq.heappop(jobs)
+        return None
+
+    async def _pace(self):
+        now = time.monotonic()
+        start = max(now, self.next_slot)
+        self.next_slot = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def _work(self):
+        while True:
+            taken = self._take()
+            if taken is None:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+
+            bucket, job = taken
+            self.queued -= 1
+            if self.queued < OUTBOUND_MAX_QUEUED:
+                self.room.set()
+            background = job.priority >= Priority.DASHBOARD
+            self.background += background
+            try:
+                # Every submitter gave up waiting, e.g. a cancelled delivery
+                if not all(future.cancelled() for future in job.futures):
+                    await self._call(job)
+            finally:
+                self.background -= background
+                self.busy.discard(bucket)
+                jobs = self.buckets.get(bucket)
+                if jobs:
+                    heapq.heappush(self.ready, (jobs[0].priority, jobs[0].seq, bucket))
+                else:
+                    self.buckets.pop(bucket, None)
+                if not self.queued and not self.busy:
+                    self.idle.set()
+                self.wakeup.set()
+
+    async def _call(self, job: Job):
+        if job.priority >= Priority.DASHBOARD:
+            await self._pace()
+        label = job.priority.name.lower()
+        OUTBOUND_WAIT.observe(label, time.monotonic() - job.queued_at)
+        OUTBOUND_CALLS.inc(label)
+        try:
+            if job.call is not None:
+                result = await job.call()
+            else:
+                result = await job.target.send(**job.kwargs)
+        except Exception as e:
+            for future in job.futures:
+                if not future.done():
+                    future.set_exception(e)
+            # Done before the worker takes the bucket's next job, so it's skipped
+            for group in job.groups:
+                for future in group:
+                    if not future.done():
+                        future.cancel()
+            return
+        for future in job.futures:
+            if not future.done():
+                future.set_result(result)
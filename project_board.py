@@ -0,0 +1,140 @@
+import asyncio
+import discord
+from db import read_db, transaction
+from project_index import Project, ProjectIndex
+from outbound import Priority
+
+BOARD_DEBOUNCE_SECONDS = 3.0
+BOARD_DESCRIPTION_CHARS = 4000
+
+# status -> (heading, color); one pinned message per status so a change edits one embed
+BOARD_SECTIONS = {
+    "in_progress": ("🛠️ В работа", discord.Color.blue()),
+    "awaiting_review": ("👀 Чакат ревю", discord.Color.gold()),
+    "approved": ("✅ Одобрени", discord.Color.green()),
+}
+
+
+def render_section(status: str, projects: list[Project]) -> discord.Embed:
+    heading, color = BOARD_SECTIONS[status]
+    lines = []
+    used = 0
+    # Newest first, so a long history truncates the oldest entries
+    for i, project in enumerate(reversed(projects)):
+        line = f"<#{project.channel_id}> **{project.title}** · <@{project.student_id}>"
+        if used + len(line) + 1 > BOARD_DESCRIPTION_CHARS:
+            lines.append(f"… и още {len(projects) - i}")
+            break
+        lines.append(line)
+        used += len(line) + 1
+    return discord.Embed(
+        title=f"{heading} ({len(projects)})",
+        description="\n".join(lines) or "—",
+        color=color,
+    )
+
+
+class ProjectBoard:
+    def __init__(self, bot: discord.Client, index: ProjectIndex):
+        self.bot = bot
+        self.index = index
+        # board channel id -> status -> pinned message id
+        self.boards: dict[int, dict[str, int]] = {}
+        # (guild_id, status) sections waiting for the next flush
+        self.dirty: set[tuple[int, str]] = set()
+        self.flush_task: asyncio.Task | None = None
+
+    async def load(self):
+        async with read_db() as db:
+            cur = await db.execute("SELECT channel_id, status, message_id FROM project_boards")
+            rows = await cur.fetchall()
+        self.boards = {}
+        for channel_id, status, message_id in rows:
+            self.boards.setdefault(channel_id, {})[status] = message_id
+        self.index.listeners.append(self.changed)
+
+    async def close(self):
+        if self.changed in self.index.listeners:
+            self.index.listeners.remove(self.changed)
+        # A debounced flush still pending at shutdown runs now instead of being dropped
+        if self.flush_task:
+            self.flush_task.cancel()
+            self.flush_task = None
+            await self.flush()
+
+    def changed(self, project: Project, old_status: str | None):
+        self.dirty.update(
+            (project.guild_id, s) for s in (old_status, project.status) if s in BOARD_SECTIONS
+        )
+        if self.dirty and self.boards and self.flush_task is None:
+            self.flush_task = asyncio.create_task(self.flush_later())
+
+    async def flush_later(self):
+        await asyncio.sleep(BOARD_DEBOUNCE_SECONDS)
+        self.flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        dirty, self.dirty = self.dirty, set()
+        # Render once per section and reuse it for every board in that guild
+        embeds = {
+            (guild_id, status): render_section(status, self.index.by_status(guild_id, status))
+            for guild_id, status in dirty
+        }
+        for channel_id in list(self.boards):
+            channel = self.bot.get_channel(channel_id)
+            if channel is None:
+                continue
+            for (guild_id, status), embed in embeds.items():
+                if guild_id == channel.guild.id:
+                    await self.publish(channel_id, status, embed)
+
+    async def publish(self, channel_id: int, status: str, embed: discord.Embed):
+        channel = self.bot.get_channel(channel_id)
+        if channel is None:
+            return
+        message_id = self.boards.get(channel_id, {}).get(status)
+        try:
+            if message_id:
+                try:
+                    await self.bot.outbound.run(
+                        Priority.DASHBOARD,
+                        ("channel", channel_id),
+                        lambda: channel.get_partial_message(message_id).edit(embed=embed),
+                    )
+                    return
+                except discord.NotFound:
+                    pass
+            # First publish, or the pinned message was deleted by hand
+            message = await self.bot.outbound.send(channel, Priority.DASHBOARD, embed=embed)
+        except discord.HTTPException as e:
+            print(f"[WARN] project board in {channel_id} ({status}) failed: {e}")
+            return
+
+        # Stored before pinning, so later flushes edit this message rather than post new ones
+        async with transaction() as db:
+            await db.execute(
+                """
+                INSERT INTO project_boards (channel_id, status, message_id) VALUES (?, ?, ?)
+                ON CONFLICT(channel_id, status) DO UPDATE SET message_id = excluded.message_id
+                """,
+                (channel_id, status, message.id),
+            )
+        self.boards.setdefault(channel_id, {})[status] = message.id
+
+        try:
+            await self.bot.outbound.run(Priority.DASHBOARD, ("channel", channel_id), message.pin)
+        except discord.HTTPException as e:
+            # Missing Manage Messages or the 50-pin cap; the board works unpinned
+            print(f"[WARN] pinning project board in {channel_id} ({status}) failed: {e}")
+
+    async def attach(self, channel: discord.TextChannel):
+        # Creating or refreshing a board renders every section from the in-memory index
+        for status in BOARD_SECTIONS:
+            projects = self.index.by_status(channel.guild.id, status)
+            await self.publish(channel.id, status, render_section(status, projects))
+
+    async def detach(self, channel_id: int):
+        self.boards.pop(channel_id, None)
+        async with transaction() as db:
+            await db.execute("DELETE FROM project_boards WHERE channel_id = ?", (channel_id,))
@@ -0,0 +1,108 @@
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+import aiosqlite
+from db import read_db, transaction
+
+
+async def log_transition(
+    db: aiosqlite.Connection,
+    project_id: int,
+    from_status: str | None,
+    to_status: str,
+    actor_id: int | None,
+):
+    # Runs inside the caller's transaction so history never disagrees with projects
+    await db.execute(
+        """
+        INSERT INTO project_events (project_id, from_status, to_status, actor_id)
+        VALUES (?, ?, ?, ?)
+        """,
+        (project_id, from_status, to_status, actor_id),
+    )
+
+
+@dataclass(slots=True)
+class Project:
+    id: int
+    student_id: int
+    channel_id: int
+    title: str
+    status: str
+    guild_id: int
+
+
+class ProjectIndex:
+    def __init__(self):
+        self._by_channel: dict[int, Project] = {}
+        # (guild_id, status) -> project id -> project, in insertion order
+        self._by_status: dict[tuple[int, str], dict[int, Project]] = {}
+        # Called with (project, previous status) after a change is committed
+        self.listeners: list[Callable[[Project, str | None], None]] = []
+
+    async def load(self):
+        async with read_db() as db:
+            cur = await db.execute(
+                """
+                SELECT id, student_id, channel_id, title, status, guild_id FROM projects
+                WHERE id IN (SELECT MAX(id) FROM projects GROUP BY channel_id)
+                ORDER BY id
+                """
+            )
+            rows = await cur.fetchall()
+        self._by_channel = {row[2]: Project(*row) for row in rows}
+        self._by_status = {}
+        for project in self._by_channel.values():
+            self._by_status.setdefault((project.guild_id, project.status), {})[project.id] = project
+
+    def get(self, channel_id: int) -> Project | None:
+        return self._by_channel.get(channel_id)
+
+    def by_status(self, guild_id: int, status: str) -> list[Project]:
+        return list(self._by_status.get((guild_id, status), {}).values())
+
+    def _move(self, project: Project, old_status: str | None, status: str):
+        if old_status is not None:
+            self._by_status.get((project.guild_id, old_status), {}).pop(project.id, None)
+        project.status = status
+        self._by_status.setdefault((project.guild_id, status), {})[project.id] = project
+
+    def _notify(self, project: Project, old_status: str | None):
+        for listener in self.listeners:
+            listener(project, old_status)
+
+    def add(self, project: Project):
+        # A newer assignment in the same channel supersedes the old one
+        old = self._by_channel.get(project.channel_id)
+        if old is not None:
+            self._by_status.get((old.guild_id, old.status), {}).pop(old.id, None)
+        self._by_channel[project.channel_id] = project
+        self._move(project, None, project.status)
+        self._notify(project, old.status if old else None)
+
+    async def set_status(
+        self,
+        project: Project,
+        status: str,
+        actor_id: int | None = None,
+        writes: Callable[[aiosqlite.Connection], Awaitable[None]] | None = None,
+    ):
+        # writes are committed together with the status change, or not at all
+        old_status = project.status
+        self._move(project, old_status, status)
+        try:
+            async with transaction() as db:
+                await db.execute(
+                    """
+                    UPDATE projects
+                    SET status = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                    """,
+                    (status, project.id),
+                )
+                await log_transition(db, project.id, old_status, status, actor_id)
+                if writes is not None:
+                    await writes(db)
+        except Exception:
+            self._move(project, status, old_status)
+            raise
+        self._notify(project, old_status)
@@ -1,24 +1,72 @@
+import asyncio
 import discord
+from db import transaction
 
-async def ensure_role(
+ROLE_CREATE_CONCURRENCY = 3
+
+CORE_ROLES = {
+    "admin": {"name": "👑 Admin", "permissions": discord.Permissions(administrator=True)},
+    "student": {"name": "🎓 Student", "color": discord.Color.blue()},
+    "pending": {"name": "⏳ Pending", "color": discord.Color.light_grey()},
+    "inactive": {"name": "🚫 Inactive", "color": discord.Color.dark_grey()},
+    "mentor": {"name": "👨‍🏫 Mentor", "color": discord.Color.gold()},
+    "web": {"name": "🌐 Web"},
+    "backend": {"name": "⚙️ Backend"},
+    "systems": {"name": "🧠 Systems / Low-level"},
+    "mobile": {"name": "📱 Mobile"},
+    "desktop": {"name": "🖥️ Desktop"},
+}
+
+
+async def create_role(
     guild: discord.Guild,
     name: str,
     color: discord.Color = discord.Color.default(),
     permissions: discord.Permissions | None = None,
     mentionable: bool = True
 ) -> discord.Role:
-    role = discord.utils.get(guild.roles, name=name)
-    if role:
-        return role
-
     if permissions is None:
         permissions = discord.Permissions.none()
 
-    role = await guild.create_role(
+    return await guild.create_role(
         name=name,
         colour=color,
         permissions=permissions,
         mentionable=mentionable,
         reason=f"DevForge BG core role '{name}' auto-created."
     )
-    return role
+
+
+async def reconcile_roles(guild: discord.Guild, spec: dict = CORE_ROLES) -> dict[str, int]:
+    # One pass over the guild's roles, then create whatever is missing in parallel
+    by_name: dict[str, discord.Role] = {}
+    for role in guild.roles:
+        by_name.setdefault(role.name, role)
+
+    ids: dict[str, int] = {}
+    missing = []
+    for key, role_spec in spec.items():
+        role = by_name.get(role_spec["name"])
+        if role:
+            ids[key] = role.id
+        else:
+            missing.append(key)
+
+    sem = asyncio.Semaphore(ROLE_CREATE_CONCURRENCY)
+
+    async def create(key: str):
+        async with sem:
+            role = await create_role(guild, **spec[key])
+        ids[key] = role.id
+
+    await asyncio.gather(*(create(key) for key in missing))
+    return ids
+
+
+async def save_role_ids(guild_id: int, ids: dict[str, int]):
+    async with transaction() as db:
+        await db.execute("DELETE FROM core_roles WHERE guild_id = ?", (guild_id,))
+        await db.executemany(
+            "INSERT INTO core_roles (guild_id, key, role_id) VALUES (?, ?, ?)",
+            [(guild_id, key, role_id) for key, role_id in ids.items()],
+        )
@@ -0,0 +1,84 @@
+import time
+from db import read_db
+
+NEGATIVE_TTL_SECONDS = 60.0
+NEGATIVE_MAX_ENTRIES = 10_000
+# check_run is opt-in per repo because CI is by far the noisiest event
+DEFAULT_REPO_EVENTS = frozenset({"push", "pull_request", "pull_request_review", "release"})
+
+
+def parse_events(value: str | None) -> frozenset[str]:
+    if value is None:
+        return DEFAULT_REPO_EVENTS
+    return frozenset(e.strip() for e in value.split(",") if e.strip())
+
+
+class RepoRoutes:
+    def __init__(self):
+        self._routes: dict[str, int] = {}
+        # Only repos with a non-default filter are stored
+        self._events: dict[str, frozenset[str]] = {}
+        self._missing: dict[str, float] = {}
+        self._loaded = False
+
+    async def load(self):
+        async with read_db() as db:
+            cur = await db.execute("SELECT repo_full_name, channel_id, events FROM repos")
+            rows = await cur.fetchall()
+        self._routes = {name: channel_id for name, channel_id, _ in rows}
+        self._events = {name: parse_events(events) for name, _, events in rows if events is not None}
+        self._missing.clear()
+        self._loaded = True
+
+    async def lookup(self, repo_full_name: str) -> int | None:
+        if not self._loaded:
+            await self.load()
+
+        channel_id = self._routes.get(repo_full_name)
+        if channel_id is not None:
+            return channel_id
+
+        now = time.monotonic()
+        expires = self._missing.get(repo_full_name)
+        if expires is not None and expires > now:
+            return None
+
+        # Rows can still be added outside the bot, so re-check once per TTL
+        async with read_db() as db:
+            cur = await db.execute(
+                "SELECT channel_id, events FROM repos WHERE repo_full_name = ?",
+                (repo_full_name,),
+            )
+            row = await cur.fetchone()
+        if row:
+            self.set(repo_full_name, row[0], row[1])
+            return row[0]
+
+        if len(self._missing) >= NEGATIVE_MAX_ENTRIES:
+            self._missing = {k: v for k, v in self._missing.items() if v > now}
+            if len(self._missing) >= NEGATIVE_MAX_ENTRIES:
+                self._missing.clear()
+        self._missing[repo_full_name] = now + NEGATIVE_TTL_SECONDS
+        return None
+
+    def set(self, repo_full_name: str, channel_id: int, events: str | None = None):
+        self._routes[repo_full_name] = channel_id
+        if events is None:
+            self._events.pop(repo_full_name, None)
+        else:
+            self._events[repo_full_name] = parse_events(events)
+        self._missing.pop(repo_full_name, None)
+
+    def accepts(self, repo_full_name: str, event: str) -> bool:
+        return event in self._events.get(repo_full_name, DEFAULT_REPO_EVENTS)
+
+    def invalidate(self, repo_full_name: str | None = None):
+        if repo_full_name is None:
+            self._routes.clear()
+            self._events.clear()
+            self._missing.clear()
+            self._loaded = False
+        else:
+            self._routes.pop(repo_full_name, None)
+            self._events.pop(repo_full_name, None)
+            self._missing.pop(repo_full_name, None)
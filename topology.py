@@ -0,0 +1,86 @@
+import aiosqlite
+import discord
+from db import read_db
+
+
+class GuildTopology:
+    def __init__(self):
+        # (guild_id, name) -> category_id
+        self._categories: dict[tuple[int, str], int] = {}
+        # (category_id, name) -> text channel id
+        self._channels: dict[tuple[int, str], int] = {}
+        # student user id -> their category id, persisted in users.category_id
+        self._student_categories: dict[int, int] = {}
+        self._built: set[int] = set()
+
+    async def load(self):
+        async with read_db() as db:
+            cur = await db.execute(
+                "SELECT id, category_id FROM users WHERE category_id IS NOT NULL"
+            )
+            self._student_categories = dict(await cur.fetchall())
+
+    def rebuild(self, guild: discord.Guild):
+        for category in guild.categories:
+            self.add(category)
+        for channel in guild.text_channels:
+            self.add(channel)
+        self._built.add(guild.id)
+
+    def _ensure_built(self, guild: discord.Guild):
+        if guild.id not in self._built:
+            self.rebuild(guild)
+
+    def add(self, channel: discord.abc.GuildChannel):
+        if isinstance(channel, discord.CategoryChannel):
+            self._categories[(channel.guild.id, channel.name)] = channel.id
+        elif isinstance(channel, discord.TextChannel) and channel.category_id:
+            self._channels[(channel.category_id, channel.name)] = channel.id
+
+    def remove(self, channel: discord.abc.GuildChannel):
+        if isinstance(channel, discord.CategoryChannel):
+            key = (channel.guild.id, channel.name)
+            if self._categories.get(key) == channel.id:
+                del self._categories[key]
+        elif isinstance(channel, discord.TextChannel) and channel.category_id:
+            key = (channel.category_id, channel.name)
+            if self._channels.get(key) == channel.id:
+                del self._channels[key]
+
+    def category(self, guild: discord.Guild, name: str) -> discord.CategoryChannel | None:
+        self._ensure_built(guild)
+        category = guild.get_channel(self._categories.get((guild.id, name), 0))
+        # Entries can go stale across a reconnect, so confirm the name still matches
+        return category if category and category.name == name else None
+
+    def channel(
+        self, category: discord.CategoryChannel, name: str
+    ) -> discord.TextChannel | None:
+        self._ensure_built(category.guild)
+        channel = category.guild.get_channel(self._channels.get((category.id, name), 0))
+        if channel and channel.name == name and channel.category_id == category.id:
+            return channel
+        return None
+
+    def student_category(
+        self, guild: discord.Guild, user: discord.abc.User
+    ) -> discord.CategoryChannel | None:
+        category_id = self._student_categories.get(user.id)
+        category = guild.get_channel(category_id) if category_id else None
+        if isinstance(category, discord.CategoryChannel):
+            return category
+        # Spaces created before category IDs were stored are still found by name
+        return self.category(guild, f"student-{user.name}".lower())
+
+    async def save_student_categories(
+        self, db: aiosqlite.Connection, pairs: list[tuple[int, int]]
+    ):
+        # Runs inside the caller's transaction so bulk onboarding commits once
+        await db.executemany(
+            """
+            INSERT INTO users (id, is_student, category_id) VALUES (?, 1, ?)
+            ON CONFLICT(id) DO UPDATE SET category_id = excluded.category_id
+            """,
+            pairs,
+        )
+        self._student_categories.update(pairs)